@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.utils.html import mark_safe
 from .models import (
     Users, UserProfile, Subject, StudentSubject, Section,
-    TeacherSubject, Attendance
+    TeacherSubject, Attendance, AttendanceSummary, AttendanceArchive
 )
 
 # Custom User Admin
@@ -87,3 +87,32 @@ class AttendanceAdmin(admin.ModelAdmin):
     search_fields = ('student__username', 'taken_by__username', 'subject__subject_name', 'section__name')
     autocomplete_fields = ('student', 'subject', 'section', 'taken_by')
     date_hierarchy = 'date'
+
+
+# AttendanceSummary Admin (maintained automatically, read-only here)
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'subject', 'month', 'present', 'absent')
+    list_filter = ('subject', 'month')
+    search_fields = ('student__username', 'subject__subject__subject_name')
+    list_select_related = ('student', 'subject__subject', 'subject__section', 'subject__teacher')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# AttendanceArchive Admin (closed terms, read-only; may live in another database)
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'student_id', 'subject_id', 'section_id', 'date', 'status', 'archived_at')
+    list_filter = ('status',)
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,5 +1,74 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from datingapp.cache import LRUCache
+
+_caches = {}
+
+
+def _configured_cache(setting, enabled_by_default, max_size, ttl):
+    config = getattr(settings, setting, {})
+    if not config.get('ENABLED', enabled_by_default):
+        return None
+    if setting not in _caches:
+        _caches[setting] = LRUCache(max_size=config.get('MAX_SIZE', max_size), ttl=config.get('TTL', ttl))
+    return _caches[setting]
+
+
+def get_user_cache():
+    """
+    The per-process user cache configured by ``AUTH_USER_CACHE``, or None when
+    it is disabled (the default).
+    """
+    return _configured_cache('AUTH_USER_CACHE', False, 1024, 60)
+
+
+def get_token_cache():
+    """
+    The per-process cache of already verified access tokens configured by
+    ``AUTH_TOKEN_CACHE``, or None when it is disabled. Entries expire with
+    the token's own ``exp`` claim.
+    """
+    return _configured_cache('AUTH_TOKEN_CACHE', True, 4096, api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def auth_cache_stats():
+    return {
+        'users': _caches['AUTH_USER_CACHE'].stats() if 'AUTH_USER_CACHE' in _caches else None,
+        'tokens': _caches['AUTH_TOKEN_CACHE'].stats() if 'AUTH_TOKEN_CACHE' in _caches else None,
+    }
+
+
+def invalidate_cached_user(user_id):
+    """Forget a user and every access token of theirs this process has verified."""
+    user_id = str(user_id)
+    if 'AUTH_USER_CACHE' in _caches:
+        _caches['AUTH_USER_CACHE'].delete(user_id)
+    if 'AUTH_TOKEN_CACHE' in _caches:
+        _caches['AUTH_TOKEN_CACHE'].delete_matching(lambda key, token: _token_user_id(token) == user_id)
+
+
+def forget_verified_token(raw_token):
+    if raw_token and 'AUTH_TOKEN_CACHE' in _caches:
+        _caches['AUTH_TOKEN_CACHE'].delete(_token_key(raw_token))
+
+
+def _token_key(raw_token):
+    if isinstance(raw_token, str):
+        raw_token = raw_token.encode()
+    return hashlib.sha256(raw_token).digest()
+
+
+def _token_user_id(token):
+    # Tokens carry the id as a string; keep keys in that form
+    return str(token.get(api_settings.USER_ID_CLAIM))
+
 
 class JWTAuthenticationFromCookie(JWTAuthentication):
     def authenticate(self, request):
@@ -13,3 +82,38 @@ class JWTAuthenticationFromCookie(JWTAuthentication):
             return self.get_user(validated_token), validated_token
         except InvalidToken:
             raise AuthenticationFailed("Invalid token in cookie")
+
+    def get_validated_token(self, raw_token):
+        cache = get_token_cache()
+        if cache is None:
+            return super().get_validated_token(raw_token)
+
+        key = _token_key(raw_token)
+        token = cache.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            ttl = token.get('exp', 0) - time.time()
+            if ttl > 0:
+                cache.set(key, token, ttl=ttl)
+        elif hasattr(token, 'check_blacklist'):
+            # Blacklistable token types must still be checked on every use
+            try:
+                token.check_blacklist()
+            except TokenError as e:
+                cache.delete(key)
+                raise InvalidToken(e.args[0])
+        return token
+
+    def get_user(self, validated_token):
+        cache = get_user_cache()
+        if cache is None:
+            return super().get_user(validated_token)
+
+        user_id = _token_user_id(validated_token)
+        user = cache.get(user_id)
+        if user is None:
+            # Inactive or missing users raise here and are never cached
+            user = super().get_user(validated_token)
+            cache.set(user_id, user)
+        # Each request gets its own instance so views can mutate request.user safely
+        return copy.copy(user)
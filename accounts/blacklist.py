@@ -0,0 +1,136 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, tunable false positives."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistFilter:
+    """
+    Per-process Bloom filter of blacklisted refresh-token JTIs.
+
+    Built from ``BlacklistedToken`` on first use, fed by blacklist signals in
+    this process, and topped up from rows added by other processes at most
+    every ``SYNC_INTERVAL`` seconds (one primary-key query for ids above the
+    last one seen). A token blacklisted by another worker is therefore
+    caught within that interval; tokens blacklisted in this process are
+    caught immediately.
+
+    Ids do not commit in order: of two concurrent logouts, id 11 can be
+    visible before id 10. Ids a sync skipped are kept as gaps and asked for
+    again on each sync for ``overlap`` seconds (rolled-back inserts leave
+    gaps that never fill). Only the ``MAX_GAPS`` ids below the newest one
+    are tracked: rows still being inserted hold recent ids, and older holes
+    are rows compaction deleted.
+    """
+    MAX_GAPS = 500
+
+    def __init__(self, capacity, error_rate, sync_interval, overlap=60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.overlap = overlap
+        self._bloom = None
+        self._last_id = 0
+        self._gaps = {}  # id -> monotonic time it was first skipped
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def might_contain(self, jti):
+        self._sync()
+        return jti in self._bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._bloom is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._bloom is not None and now - self._synced_at < self.sync_interval:
+                return
+            if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+                total = BlacklistedToken.objects.count()
+                self._bloom = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+                self._last_id = 0
+                self._gaps = {}
+            rows = BlacklistedToken.objects.filter(Q(id__gt=self._last_id) | Q(id__in=list(self._gaps))).order_by('id')
+            for pk, jti in rows.values_list('id', 'token__jti').iterator():
+                self._bloom.add(jti)
+                if pk > self._last_id:
+                    skipped = range(max(self._last_id + 1, pk - self.MAX_GAPS), pk)
+                    self._gaps.update(dict.fromkeys(skipped, now))
+                    self._last_id = pk
+                self._gaps.pop(pk, None)
+            self._gaps = {
+                pk: skipped for pk, skipped in self._gaps.items()
+                if now - skipped < self.overlap and pk >= self._last_id - self.MAX_GAPS
+            }
+            self._synced_at = time.monotonic()
+
+
+_filter = None
+
+
+def get_blacklist_filter():
+    """The process-wide filter configured by ``TOKEN_BLACKLIST_FILTER``, or None when disabled."""
+    global _filter
+    config = getattr(settings, 'TOKEN_BLACKLIST_FILTER', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _filter is None:
+        _filter = BlacklistFilter(
+            capacity=config.get('CAPACITY', 100_000),
+            error_rate=config.get('ERROR_RATE', 0.001),
+            sync_interval=config.get('SYNC_INTERVAL', 5),
+            overlap=config.get('SYNC_OVERLAP', 60),
+        )
+    return _filter
+
+
+def remember_blacklisted(jti):
+    if _filter is not None:
+        _filter.add(jti)
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken that only asks the database about JTIs the Bloom filter might contain."""
+
+    def check_blacklist(self):
+        jti_filter = get_blacklist_filter()
+        if jti_filter is not None and not jti_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
@@ -0,0 +1,91 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import AttendanceArchive, Section, TeacherSubject, Users
+
+# (column name, values_list lookup) pairs written by every export format
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('date', 'date'),
+    ('status', 'status'),
+    ('student_id', 'student_id'),
+    ('student', 'student__username'),
+    ('subject_id', 'subject_id'),
+    ('subject', 'subject__subject__subject_name'),
+    ('teacher', 'subject__teacher__username'),
+    ('section', 'section__name'),
+    ('taken_by', 'taken_by__username'),
+)
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_rows(queryset, chunk_size=2000):
+    """
+    Stream attendance as plain tuples.
+
+    ``iterator()`` uses a server-side cursor where the backend has one, so
+    only ``chunk_size`` rows are held in memory at a time. Rows come out in
+    primary-key order, which needs no sort on the database side.
+    """
+    queryset = queryset.order_by('id')
+    if queryset.model is AttendanceArchive:
+        return _archive_rows(queryset, chunk_size)
+    return queryset.values_list(*[lookup for _, lookup in EXPORT_COLUMNS]).iterator(chunk_size=chunk_size)
+
+
+def _archive_rows(queryset, chunk_size):
+    # The archive may sit in another database, so names come from lookup maps
+    # loaded once from the main database instead of joins.
+    usernames = dict(Users.objects.values_list('id', 'username'))
+    sections = dict(Section.objects.values_list('id', 'name'))
+    subjects = {
+        pk: (subject_name, teacher)
+        for pk, subject_name, teacher in TeacherSubject.objects.values_list(
+            'id', 'subject__subject_name', 'teacher__username'
+        )
+    }
+    rows = queryset.values_list(
+        'id', 'date', 'status', 'student_id', 'subject_id', 'section_id', 'taken_by_id'
+    ).iterator(chunk_size=chunk_size)
+    for pk, day, status, student_id, subject_id, section_id, taken_by_id in rows:
+        subject_name, teacher = subjects.get(subject_id, (None, None))
+        yield (
+            pk, day, status, student_id, usernames.get(student_id), subject_id, subject_name,
+            teacher, sections.get(section_id), usernames.get(taken_by_id),
+        )
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+    def write(self, value):
+        return value
+
+
+def _batched(lines, size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def csv_stream(rows, batch_size=500):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    yield from _batched((writer.writerow(row) for row in rows), batch_size)
+
+
+def ndjson_stream(rows, batch_size=500):
+    encoder = DjangoJSONEncoder()
+    yield from _batched((encoder.encode(dict(zip(HEADER, row))) + '\n' for row in rows), batch_size)
+
+
+# format -> (stream function, content type)
+EXPORT_FORMATS = {
+    'csv': (csv_stream, 'text/csv'),
+    'ndjson': (ndjson_stream, 'application/x-ndjson'),
+}
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with its cost taken from ``settings.ARGON2_PARAMETERS``.
+
+    Django rehashes a password on the next successful login whenever the
+    stored hash uses another algorithm or other parameters, so changing the
+    settings migrates users transparently.
+    """
+    algorithm = 'argon2'
+
+    def _parameter(self, name, default):
+        return getattr(settings, 'ARGON2_PARAMETERS', {}).get(name, default)
+
+    @property
+    def time_cost(self):
+        return self._parameter('TIME_COST', 2)
+
+    @property
+    def memory_cost(self):
+        return self._parameter('MEMORY_COST', 19456)
+
+    @property
+    def parallelism(self):
+        return self._parameter('PARALLELISM', 1)
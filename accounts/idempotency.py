@@ -0,0 +1,105 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import UploadedFile
+from django.http import QueryDict
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+_IN_PROGRESS = 'in-progress'
+
+
+def _store():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE', 'default')]
+
+
+def _in_progress_timeout():
+    return getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_TIMEOUT', 60)
+
+
+def _encode(value):
+    if isinstance(value, UploadedFile):
+        digest = hashlib.sha256()
+        for chunk in value.chunks():
+            digest.update(chunk)
+        value.seek(0)  # the view reads it next
+        return {'name': value.name, 'size': value.size, 'sha256': digest.hexdigest()}
+    return str(value)
+
+
+def _fingerprint(data):
+    # Uploaded files are fingerprinted by content, not by their str() (the file name)
+    if isinstance(data, QueryDict):
+        data = dict(data.lists())
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=_encode).encode()).hexdigest()
+
+
+def idempotent(view_method=None, *, per_user=True):
+    """
+    Honor an ``Idempotency-Key`` header on a write endpoint.
+
+    The first response for a key (scoped to method, path and, unless
+    ``per_user=False`` as for anonymous sign-up, the user) is kept
+    in the ``IDEMPOTENCY_CACHE`` store; retries with the same key and body
+    get that response back, cookies included, without running the view
+    again. A retry that arrives while the first request is still running
+    gets 409 instead of competing with it for row locks. That marker only
+    lives for ``IDEMPOTENCY_IN_PROGRESS_TIMEOUT`` seconds, so a worker that
+    dies mid-request does not block the key for the cache's full timeout.
+    5xx responses and exceptions are not stored, so those can be retried.
+    """
+    if view_method is None:
+        return lambda method: idempotent(method, per_user=per_user)
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        store = _store()
+        owner = request.user.pk if per_user and request.user.is_authenticated else 'anon'
+        cache_key = 'idempotency:' + hashlib.sha256(
+            f"{request.method}:{request.path}:{owner}:{key}".encode()
+        ).hexdigest()
+        fingerprint = _fingerprint(request.data)
+
+        if not store.add(cache_key, _IN_PROGRESS, _in_progress_timeout()):
+            stored = store.get(cache_key)
+            if stored == _IN_PROGRESS:
+                return Response({"error": "A request with this Idempotency-Key is still being processed."},
+                                status=status.HTTP_409_CONFLICT)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response({"error": f"{HEADER} was already used for a different request."},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                replay = Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+                replay.cookies.update(stored['cookies'])
+                return replay
+            # Expired between add() and get(): claim it again and run normally
+            store.add(cache_key, _IN_PROGRESS, _in_progress_timeout())
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            store.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            store.delete(cache_key)
+        else:
+            store.set(cache_key, {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'data': response.data,
+                'cookies': response.cookies,
+            })
+        return response
+    return wrapper
@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.dateparse import parse_date
+
+from accounts.models import Attendance, AttendanceArchive
+from accounts.routers import archive_database
+
+FIELDS = ('id', 'student_id', 'subject_id', 'section_id', 'date', 'status', 'taken_by_id')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move attendance dated before a cutoff into the AttendanceArchive table "
+        "(optionally in another database), in batches. Safe to re-run after a failure. "
+        "Attendance summaries keep counting archived rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Cutoff date YYYY-MM-DD (exclusive). "
+                                             "Defaults to settings.ATTENDANCE_ARCHIVE_BEFORE.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would move.")
+
+    def handle(self, *args, **options):
+        raw_cutoff = options['before'] or getattr(settings, 'ATTENDANCE_ARCHIVE_BEFORE', None)
+        cutoff = parse_date(str(raw_cutoff)) if raw_cutoff else None
+        if cutoff is None:
+            raise CommandError("Give --before YYYY-MM-DD or set ATTENDANCE_ARCHIVE_BEFORE.")
+
+        pending = Attendance.objects.filter(date__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f"{pending.count()} attendance rows dated before {cutoff} would be archived.")
+            return
+
+        archive_db = archive_database()
+        moved = 0
+        conflicts = []
+        last_id = 0
+        started = time.monotonic()
+        while True:
+            # Walk by id so rows left in place are not picked up again
+            rows = list(pending.filter(id__gt=last_id).order_by('id').values(*FIELDS)[:options['batch_size']])
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            ids = [row['id'] for row in rows]
+            # Copy first, then delete: a crash in between leaves rows in both
+            # places and the re-run skips the copies already archived.
+            with transaction.atomic(using=archive_db):
+                AttendanceArchive.objects.using(archive_db).bulk_create(
+                    [AttendanceArchive(**row) for row in rows], ignore_conflicts=True
+                )
+                # A row whose (student, subject, date) is archived under another id was
+                # not inserted; only rows whose id made it into the archive are deleted
+                archived = set(
+                    AttendanceArchive.objects.using(archive_db).filter(id__in=ids).values_list('id', flat=True)
+                )
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                Attendance.objects.delete_archived(archived)
+            conflicts += [pk for pk in ids if pk not in archived]
+            moved += len(archived)
+            self.stdout.write(f"Archived {moved} rows ({moved / (time.monotonic() - started):.0f} rows/s)")
+
+        if conflicts:
+            self.stderr.write(
+                f"{len(conflicts)} rows were left in Attendance because their student, subject and date "
+                f"are already archived under another id: {', '.join(map(str, conflicts[:50]))}"
+                + (" ..." if len(conflicts) > 50 else "")
+            )
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} attendance rows dated before {cutoff}."))
@@ -0,0 +1,45 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management.base import BaseCommand
+
+from accounts.password_pool import PasswordCheckPool
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = "Measure password verifications per second: serial PBKDF2 vs the bounded pool with Argon2."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200, help="Verifications per scenario.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        checks, workers = options['checks'], options['workers']
+        scenarios = (
+            # before: default Django hasher, one check at a time per request thread
+            ('pbkdf2 serial', 'pbkdf2_sha256', None),
+            ('pbkdf2 pool', 'pbkdf2_sha256', workers),
+            # after: tuned Argon2id on the login pool
+            ('argon2 pool', 'argon2', workers),
+        )
+        self.stdout.write(f"{checks} checks per scenario, {workers} workers")
+        for label, algorithm, pool_workers in scenarios:
+            encoded = make_password(PASSWORD, hasher=get_hasher(algorithm))
+            started = time.perf_counter()
+            if pool_workers is None:
+                for _ in range(checks):
+                    check_password(PASSWORD, encoded)
+            else:
+                pool = PasswordCheckPool(workers=pool_workers, max_pending=checks, wait=None)
+                with ThreadPoolExecutor(max_workers=pool_workers * 2) as callers:
+                    list(callers.map(lambda _: pool.run(check_password, PASSWORD, encoded), range(checks)))
+            seconds = time.perf_counter() - started
+            rate = checks / seconds
+            self.stdout.write(
+                f"{label:<14} {rate:8.1f}/s  {rate / (pool_workers or 1):7.1f}/s per core  "
+                f"{seconds / checks * 1000:7.2f} ms/check"
+            )
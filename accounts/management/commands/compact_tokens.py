@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.compaction import compact_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding/blacklisted JWTs in small, time-boxed batches."
+
+    def add_arguments(self, parser):
+        defaults = getattr(settings, 'TOKEN_COMPACTION', {})
+        parser.add_argument('--batch-size', type=int, default=defaults.get('BATCH_SIZE', 500))
+        parser.add_argument('--time-budget', type=float, default=None,
+                            help="Stop after this many seconds (default: run until done, "
+                                 "or TOKEN_COMPACTION['TIME_BUDGET'] per round with --interval).")
+        parser.add_argument('--pause', type=float, default=defaults.get('PAUSE', 0.05),
+                            help="Seconds to sleep between batches.")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Keep running, compacting every this many seconds.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        time_budget = options['time_budget']
+        if interval and time_budget is None:
+            time_budget = getattr(settings, 'TOKEN_COMPACTION', {}).get('TIME_BUDGET', 5)
+        while True:
+            report = compact_tokens(
+                batch_size=options['batch_size'],
+                time_budget=time_budget,
+                pause=options['pause'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Reclaimed {report.outstanding} outstanding and {report.blacklisted} blacklisted tokens "
+                f"in {report.batches} batches, {report.seconds}s"
+                + ("" if report.complete else " (time budget reached, run again to continue)")
+            ))
+            if not interval:
+                return
+            # Don't sit on a stale or broken connection between rounds
+            close_old_connections()
+            time.sleep(interval)
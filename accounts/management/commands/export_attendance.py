@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.export import EXPORT_FORMATS, export_rows
+from accounts.models import Attendance
+from accounts.serializer import AttendanceFilterSerializer
+
+
+class Command(BaseCommand):
+    help = "Stream attendance records to CSV or NDJSON without loading them into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write to (defaults to stdout).")
+        parser.add_argument('--date-from', help="YYYY-MM-DD, inclusive.")
+        parser.add_argument('--date-to', help="YYYY-MM-DD, inclusive.")
+        parser.add_argument('--section', type=int, help="Section id.")
+        parser.add_argument('--subject', type=int, help="TeacherSubject id.")
+        parser.add_argument('--status', choices=[value for value, _ in Attendance.STATUS_CHOICES])
+        parser.add_argument('--archived', action='store_true', help="Export from the archive table.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        filters = AttendanceFilterSerializer(data={
+            key: options[option]
+            for key, option in (
+                ('date_from', 'date_from'), ('date_to', 'date_to'),
+                ('section', 'section'), ('subject', 'subject'), ('status', 'status'),
+            )
+            if options[option] is not None
+        } | {'archived': options['archived']})
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        stream, _ = EXPORT_FORMATS[options['format']]
+        rows = export_rows(filters.filter_queryset(filters.get_model().objects.all()), options['chunk_size'])
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in stream(rows):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
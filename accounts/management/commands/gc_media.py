@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from datingapp.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed media blobs that no row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600,
+                            help="Keep files younger than this many seconds (uploads still committing).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted.")
+
+    def handle(self, *args, **options):
+        report = collect_garbage(grace=options['grace'], dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.blobs} blobs, {report.references} references ({report.shared} blobs shared). "
+            f"{verb} {report.deleted} files, {report.freed_bytes / 1024 / 1024:.1f} MiB."
+        ))
@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from datingapp.imaging import process
+
+
+class Command(BaseCommand):
+    help = (
+        "Build resized image variants for existing uploads (every field in "
+        "IMAGE_VARIANTS['SIZES']). Rows whose variants are current are skipped unless --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fields', nargs='*',
+                            help="Limit to these app_label.Model.field entries, e.g. products.Product.image.")
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        configured = list(getattr(settings, 'IMAGE_VARIANTS', {}).get('SIZES', {}))
+        targets = options['fields'] or configured
+        unknown = set(targets) - set(configured)
+        if unknown:
+            raise CommandError(f"Not configured in IMAGE_VARIANTS['SIZES']: {', '.join(sorted(unknown))}")
+
+        for target in targets:
+            model_label, field_name = target.rsplit('.', 1)
+            model = apps.get_model(model_label)
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            built = 0
+            for pk, name, variants in rows.values_list('pk', field_name, 'image_variants').iterator():
+                if not options['force'] and (variants or {}).get('source') == name:
+                    continue
+                process(model_label, pk, field_name, name)
+                built += 1
+            self.stdout.write(self.style.SUCCESS(f"{target}: built variants for {built} rows"))
@@ -0,0 +1,148 @@
+import csv
+import time
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from accounts.models import Attendance, AttendanceArchive, Section, TeacherSubject, Users
+
+STATUSES = {'p': 'P', 'present': 'P', 'a': 'A', 'absent': 'A'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load historical attendance from CSV files with the columns "
+        "student, subject, section, date, status and optionally teacher and taken_by "
+        "(the same layout export_attendance writes). Rows are upserted on "
+        "(student, subject, date) in batches; use --skip to resume after a failed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="CSV files, read in order.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip', type=int, default=0,
+                            help="Data rows of the first file to skip (resume point printed on failure).")
+        parser.add_argument('--max-reported-errors', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.build_lookups()
+        self.batch_size = options['batch_size']
+        self.max_reported_errors = options['max_reported_errors']
+        self.written = self.skipped = self.invalid = 0
+        self.started = time.monotonic()
+
+        for index, path in enumerate(options['files']):
+            self.import_file(path, skip=options['skip'] if index == 0 else 0)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.written} rows written, {self.invalid} invalid, {self.skipped} skipped "
+            f"in {elapsed:.1f}s ({self.written / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+
+    def build_lookups(self):
+        """Load every name the CSV can reference once, instead of querying per row."""
+        self.students = dict(Users.objects.filter(Role='user').values_list('username', 'id'))
+        self.staff = dict(Users.objects.exclude(Role='user').values_list('username', 'id'))
+        self.sections = dict(Section.objects.values_list('name', 'id'))
+        # (subject name, section name) -> [(TeacherSubject id, teacher username, teacher id)]
+        self.teacher_subjects = defaultdict(list)
+        for ts_id, subject_name, section_name, teacher_name, teacher_id in TeacherSubject.objects.values_list(
+            'id', 'subject__subject_name', 'section__name', 'teacher__username', 'teacher_id'
+        ):
+            self.teacher_subjects[(subject_name, section_name)].append((ts_id, teacher_name, teacher_id))
+
+    def import_file(self, path, skip=0):
+        batch = []
+        batch_start = skip + 1
+        try:
+            handle = open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f"Cannot open {path}: {exc}")
+
+        with handle:
+            for row_number, row in enumerate(csv.DictReader(handle), start=1):
+                if row_number <= skip:
+                    self.skipped += 1
+                    continue
+                try:
+                    batch.append(self.build_record(row))
+                except ValueError as exc:
+                    self.invalid += 1
+                    if self.invalid <= self.max_reported_errors:
+                        self.stderr.write(f"{path}:{row_number + 1}: {exc}")
+                if len(batch) >= self.batch_size:
+                    self.flush(path, batch, batch_start, row_number)
+                    batch, batch_start = [], row_number + 1
+            if batch:
+                self.flush(path, batch, batch_start, row_number)
+
+    def build_record(self, row):
+        def column(name, required=True):
+            value = (row.get(name) or '').strip()
+            if required and not value:
+                raise ValueError(f"missing {name}")
+            return value
+
+        student_id = self.students.get(column('student'))
+        if student_id is None:
+            raise ValueError(f"unknown student {row['student']!r}")
+        section_name = column('section')
+        section_id = self.sections.get(section_name)
+        if section_id is None:
+            raise ValueError(f"unknown section {section_name!r}")
+
+        candidates = self.teacher_subjects.get((column('subject'), section_name), [])
+        teacher = column('teacher', required=False)
+        if teacher:
+            candidates = [c for c in candidates if c[1] == teacher]
+        if len(candidates) != 1:
+            problem = "no" if not candidates else "more than one"
+            raise ValueError(f"{problem} TeacherSubject for {row['subject']!r} in section {section_name!r}"
+                             + ("" if teacher or not candidates else ", add a teacher column"))
+        subject_id, _, teacher_id = candidates[0]
+
+        status = STATUSES.get(column('status').lower())
+        if status is None:
+            raise ValueError(f"invalid status {row['status']!r}")
+        try:
+            date = Attendance._meta.get_field('date').to_python(column('date'))
+        except ValidationError:
+            raise ValueError(f"invalid date {row['date']!r}")
+
+        taken_by = column('taken_by', required=False)
+        taken_by_id = self.staff.get(taken_by, teacher_id) if taken_by else teacher_id
+        return Attendance(
+            student_id=student_id, subject_id=subject_id, section_id=section_id,
+            date=date, status=status, taken_by_id=taken_by_id,
+        )
+
+    def flush(self, path, batch, first_row, last_row):
+        # Keys already archived are counted in the summary by their archived row
+        archived = AttendanceArchive.objects.archived_keys(
+            (record.student_id, record.subject_id, record.date) for record in batch
+        )
+        if archived:
+            kept = [record for record in batch if (record.student_id, record.subject_id, record.date) not in archived]
+            self.invalid += len(batch) - len(kept)
+            self.stderr.write(
+                f"{path}: rows {first_row}-{last_row}: {len(batch) - len(kept)} rows are for archived "
+                f"attendance and were not imported"
+            )
+            batch = kept
+        try:
+            Attendance.objects.bulk_upsert(batch)
+        except DatabaseError as exc:
+            raise CommandError(
+                f"Batch {path} rows {first_row}-{last_row} failed and was rolled back: {exc}\n"
+                f"Everything before row {first_row} is committed; resume with: "
+                f"--skip {first_row - 1} {path} ..."
+            )
+        self.written += len(batch)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{path}: rows {first_row}-{last_row} committed, {self.written} written so far "
+            f"({self.written / elapsed if elapsed else 0:.0f} rows/s)"
+        )
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per profile so imports and memory are not shared
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+startup_ms = (time.perf_counter() - started) * 1000
+rss_kb = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS:'))
+
+from django.test import Client
+client = Client()
+path, requests = sys.argv[1], int(sys.argv[2])
+for _ in range(50):
+    client.get(path)
+started = time.perf_counter()
+for _ in range(requests):
+    response = client.get(path)
+request_us = (time.perf_counter() - started) / requests * 1_000_000
+print(json.dumps({
+    'startup_ms': startup_ms, 'rss_kb': rss_kb, 'request_us': request_us,
+    'status': response.status_code, 'modules': len(sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare worker startup time, resident memory and per-request overhead between "
+        "settings profiles (default: datingapp.settings vs datingapp.settings_api)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['datingapp.settings', 'datingapp.settings_api'])
+        parser.add_argument('--path', default='/api/accounts/sections/',
+                            help="Endpoint requested through the full middleware stack.")
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--runs', type=int, default=3, help="Fresh processes per profile; medians are shown.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            runs = [self.probe(profile, options['path'], options['requests']) for _ in range(options['runs'])]
+            results[profile] = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+
+        self.stdout.write(f"{'profile':<28} {'startup ms':>10} {'RSS MiB':>8} {'modules':>8} {'µs/request':>10}  status")
+        for profile, result in results.items():
+            self.stdout.write(
+                f"{profile:<28} {result['startup_ms']:10.1f} {result['rss_kb'] / 1024:8.1f} "
+                f"{result['modules']:8d} {result['request_us']:10.1f}  {result['status']}"
+            )
+        if len(results) > 1:
+            base = next(iter(results.values()))
+            for profile, result in list(results.items())[1:]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{profile} saves {base['startup_ms'] - result['startup_ms']:.1f} ms startup, "
+                    f"{(base['rss_kb'] - result['rss_kb']) / 1024:.1f} MiB RSS and "
+                    f"{base['request_us'] - result['request_us']:.1f} µs per request"
+                ))
+
+    def probe(self, profile, path, requests):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile}
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE, path, str(requests)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f"{profile} probe failed:\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
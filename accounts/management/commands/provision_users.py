@@ -0,0 +1,59 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisioning import provision_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create accounts in bulk from CSV or JSON files (columns email, username, password and "
+        "optionally Role, section and ;-separated subjects). Passwords are hashed on a process "
+        "pool; users, profiles and subject assignments are inserted with bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="CSV or .json files, read in order.")
+        parser.add_argument('--workers', type=int, default=None, help="Hashing processes (default: CPU count).")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--report', help="Write the per-row result report to this CSV file.")
+
+    def handle(self, *args, **options):
+        rows, sources = [], []
+        for path in options['files']:
+            file_format = 'json' if path.lower().endswith('.json') else 'csv'
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as handle:
+                    file_rows = read_rows(handle, file_format)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {path}: {exc}")
+            rows.extend(file_rows)
+            sources.extend((path, number) for number in range(1, len(file_rows) + 1))
+
+        started = time.monotonic()
+        results = provision_users(rows, workers=options['workers'], batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        created = 0
+        for (path, number), result in zip(sources, results):
+            result['file'], result['row'] = path, number
+            if result['status'] == 'created':
+                created += 1
+            else:
+                self.stderr.write(f"{path}:{number}: {'; '.join(result['errors'])}")
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['file', 'row', 'email', 'status', 'id', 'errors'])
+                for result in results:
+                    writer.writerow([
+                        result['file'], result['row'], result['email'], result['status'],
+                        result.get('id', ''), '; '.join(result.get('errors', [])),
+                    ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} of {len(results)} users in {elapsed:.1f}s "
+            f"({created / elapsed if elapsed else 0:.0f} users/s)."
+        ))
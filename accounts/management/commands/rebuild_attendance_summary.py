@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import AttendanceSummary
+
+
+class Command(BaseCommand):
+    help = "Recount the attendance rollup table from scratch (e.g. after raw SQL edits)."
+
+    def handle(self, *args, **options):
+        rows = AttendanceSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} attendance summary rows."))
@@ -1,5 +1,6 @@
 # middleware.py
 import json
+from django.utils.decorators import decorator_from_middleware
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
@@ -16,3 +17,7 @@ class RefreshCookieToBodyMiddleware(MiddlewareMixin):
                 data['refresh'] = refresh_token
                 request._body = json.dumps(data).encode('utf-8')
         return None
+
+
+# Per-view form, so only the refresh route pays for it
+refresh_cookie_to_body = decorator_from_middleware(RefreshCookieToBodyMiddleware)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(
+                fields=["section", "date", "id"], name="attendance_section_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(
+                fields=["subject", "date", "id"], name="attendance_subject_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="teachersubject",
+            index=models.Index(
+                fields=["teacher", "section"], name="teachersubject_teacher_idx"
+            ),
+        ),
+    ]
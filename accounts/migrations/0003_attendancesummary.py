@@ -0,0 +1,89 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def count_attendance(apps, schema_editor):
+    # Same counting as AttendanceSummaryManager.rebuild(); there is no archive yet
+    Attendance = apps.get_model("accounts", "Attendance")
+    AttendanceSummary = apps.get_model("accounts", "AttendanceSummary")
+    db = schema_editor.connection.alias
+    rows = (
+        Attendance.objects.using(db)
+        .annotate(month=TruncMonth("date"))
+        .values_list("student_id", "subject_id", "month")
+        .annotate(
+            present=Count("id", filter=Q(status="P")),
+            absent=Count("id", filter=Q(status="A")),
+        )
+        .order_by()
+    )
+    AttendanceSummary.objects.using(db).bulk_create(
+        [
+            AttendanceSummary(
+                student_id=student_id, subject_id=subject_id, month=month, present=present, absent=absent
+            )
+            for student_id, subject_id, month, present, absent in rows
+        ],
+        batch_size=90,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_attendance_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttendanceSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "month",
+                    models.DateField(help_text="First day of the month being counted"),
+                ),
+                ("present", models.PositiveIntegerField(default=0)),
+                ("absent", models.PositiveIntegerField(default=0)),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="accounts.teachersubject",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "attendance summaries",
+                "indexes": [
+                    models.Index(
+                        fields=["subject", "month"],
+                        name="attendancesummary_subject_idx",
+                    )
+                ],
+                "unique_together": {("student", "subject", "month")},
+            },
+        ),
+        migrations.RunPython(count_attendance, migrations.RunPython.noop),
+    ]
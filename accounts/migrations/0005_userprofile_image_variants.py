@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_attendancearchive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import TruncMonth
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
 from django.conf import settings
 import os
+from contextvars import ContextVar
+from datetime import timedelta
 from uuid import uuid4
 from django.utils.html import mark_safe
 
@@ -89,9 +93,91 @@ class TeacherSubject(models.Model):
     )
     subject_time = models.TimeField()
 
+    class Meta:
+        indexes = [
+            # Covers the teacher -> sections semi-join used by attendance listings
+            models.Index(fields=['teacher', 'section'], name='teachersubject_teacher_idx'),
+        ]
+
     def __str__(self):
         return f"{self.subject.subject_name} - {self.section.name} ({self.teacher.username})"
 
+class TeacherSectionsMixin:
+    def for_teacher_by_section(self, teacher, section=None):
+        """
+        Attendance in every section the teacher takes a subject in, as one
+        queryset per section (see KeysetPagination.paginate_querysets).
+
+        The (section, date, id) index orders the rows of one section, so
+        each queryset pages by seeking into it. A single
+        ``section_id IN (...)`` queryset would have to sort all of the
+        teacher's rows for every page. Sections are resolved first, which
+        also keeps the archive free of cross-database subqueries.
+        """
+        sections = TeacherSubject.objects.filter(teacher=teacher)
+        if section is not None:
+            sections = sections.filter(section_id=section)
+        section_ids = sections.values_list('section_id', flat=True).distinct().order_by('section_id')
+        return [self.filter(section_id=section_id) for section_id in section_ids]
+
+
+# True while archive_attendance deletes rows it has copied to the archive;
+# the summary keeps counting them (see signals.uncount_deleted_attendance)
+archiving_attendance = ContextVar('archiving_attendance', default=False)
+
+
+# Attendance Manager
+class AttendanceManager(TeacherSectionsMixin, models.Manager):
+    def delete_archived(self, ids):
+        """Delete hot rows already copied to AttendanceArchive, leaving their months counted."""
+        token = archiving_attendance.set(True)
+        try:
+            return self.filter(id__in=ids).delete()
+        finally:
+            archiving_attendance.reset(token)
+
+    def bulk_upsert(self, records):
+        """
+        Insert or update a batch of attendance records in one statement.
+
+        ``records`` are unsaved ``Attendance`` instances (FK ids set). Rows
+        sharing a (student, subject, date) key collapse to the last one, the
+        same result a loop of ``update_or_create`` calls would leave behind.
+        """
+        unique = {}
+        for record in records:
+            unique[(record.student_id, record.subject_id, record.date)] = record
+        if not unique:
+            return []
+
+        with transaction.atomic(using=self.db):
+            # Two first submissions of a key would both read "no row" and both count
+            # an insert, and rows that do not exist yet cannot be locked. So lock
+            # the summary rows they feed first: a concurrent submission for the
+            # same month waits here, then reads the rows this one wrote.
+            AttendanceSummary.objects.lock({(key[0], key[1], month_of(key[2])) for key in unique})
+            previous = {}
+            existing = self.select_for_update().filter(
+                student_id__in={key[0] for key in unique},
+                subject_id__in={key[1] for key in unique},
+                date__in={key[2] for key in unique},
+            ).values_list('student_id', 'subject_id', 'date', 'status')
+            for student_id, subject_id, day, status in existing:
+                if (student_id, subject_id, day) in unique:
+                    previous[(student_id, subject_id, day)] = status
+
+            saved = self.bulk_create(
+                list(unique.values()),
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'date'],
+                update_fields=['section', 'status', 'taken_by'],
+            )
+            AttendanceSummary.objects.apply_changes(
+                ((*key, previous[key]) if key in previous else None, (*key, record.status))
+                for key, record in unique.items()
+            )
+        return saved
+
 # Attendance Model
 class Attendance(models.Model):
     STATUS_CHOICES = (
@@ -115,13 +201,210 @@ class Attendance(models.Model):
         related_name='taken_attendance'
     )
 
+    objects = AttendanceManager()
+
     class Meta:
         unique_together = ('student', 'subject', 'date')
+        indexes = [
+            models.Index(fields=['section', 'date', 'id'], name='attendance_section_date_idx'),
+            models.Index(fields=['subject', 'date', 'id'], name='attendance_subject_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.subject} - {self.date} - {self.status}"
 
+# Attendance rollups
+class AttendanceSummaryManager(models.Manager):
+    # Keys per UPDATE statement. Each key binds up to 11 parameters (3 in the
+    # WHERE, 4 in each CASE), so 90 keys stay under SQLite's 999-parameter limit
+    batch_size = 90
+
+    def apply_changes(self, changes):
+        """
+        Fold attendance writes into the monthly counters.
+
+        ``changes`` is an iterable of ``(old, new)`` pairs, each either
+        ``None`` or a ``(student_id, subject_id, date, status)`` tuple: an
+        insert is ``(None, new)``, a delete ``(old, None)`` and an edit
+        (including a P -> A flip) backs ``old`` out and counts ``new``.
+        """
+        deltas = {}
+        for old, new in changes:
+            for record, step in ((old, -1), (new, 1)):
+                if record is None:
+                    continue
+                student_id, subject_id, day, status = record
+                key = (student_id, subject_id, month_of(day))
+                present, absent = deltas.get(key, (0, 0))
+                if status == 'P':
+                    present += step
+                else:
+                    absent += step
+                deltas[key] = (present, absent)
+
+        deltas = [(key, delta) for key, delta in deltas.items() if delta != (0, 0)]
+        for start in range(0, len(deltas), self.batch_size):
+            self._apply(deltas[start:start + self.batch_size])
+
+    def lock(self, keys):
+        """
+        Create (if missing) and lock the summary rows for ``(student_id,
+        subject_id, month)`` keys until the transaction ends.
+
+        The insert comes first, so on SQLite it takes the database write
+        lock; elsewhere the rows are locked with ``SELECT ... FOR UPDATE``.
+        """
+        keys = sorted(keys)
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            self.bulk_create(
+                [self.model(student_id=s, subject_id=t, month=m) for s, t, m in batch], ignore_conflicts=True,
+            )
+            rows = Q()
+            for student_id, subject_id, month in batch:
+                rows |= Q(student_id=student_id, subject_id=subject_id, month=month)
+            list(self.select_for_update().filter(rows).order_by('pk').values_list('pk', flat=True))
+
+    def _apply(self, deltas):
+        self.bulk_create(
+            [self.model(student_id=s, subject_id=t, month=m) for (s, t, m), _ in deltas],
+            ignore_conflicts=True,
+        )
+        keys = Q()
+        present_cases = []
+        absent_cases = []
+        for (student_id, subject_id, month), (present, absent) in deltas:
+            key = Q(student_id=student_id, subject_id=subject_id, month=month)
+            keys |= key
+            if present:
+                present_cases.append(When(key, then=Value(present)))
+            if absent:
+                absent_cases.append(When(key, then=Value(absent)))
+        self.filter(keys).update(
+            present=F('present') + Case(*present_cases, default=Value(0)),
+            absent=F('absent') + Case(*absent_cases, default=Value(0)),
+        )
+
+    def rebuild(self):
+        """
+        Recount every summary row from Attendance and AttendanceArchive.
+
+        The archive may live in another database, so each table is counted
+        on its own and the two are added up here.
+        """
+        counts = {}
+        for model in (Attendance, AttendanceArchive):
+            rows = (
+                model.objects.annotate(month=TruncMonth('date'))
+                .values_list('student_id', 'subject_id', 'month')
+                .annotate(
+                    present=Count('id', filter=Q(status='P')),
+                    absent=Count('id', filter=Q(status='A')),
+                )
+                .order_by()
+            )
+            for student_id, subject_id, month, present, absent in rows:
+                key = (student_id, subject_id, month)
+                counted = counts.get(key, (0, 0))
+                counts[key] = (counted[0] + present, counted[1] + absent)
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            return self.bulk_create(
+                [
+                    self.model(student_id=student_id, subject_id=subject_id, month=month, present=present, absent=absent)
+                    for (student_id, subject_id, month), (present, absent) in counts.items()
+                ],
+                batch_size=self.batch_size,
+            )
+
+
+def month_of(day):
+    day = Attendance._meta.get_field('date').to_python(day)
+    return day.replace(day=1)
+
+
+class AttendanceSummary(models.Model):
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='attendance_summaries'
+    )
+    subject = models.ForeignKey(TeacherSubject, on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month being counted")
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+
+    objects = AttendanceSummaryManager()
+
+    class Meta:
+        unique_together = ('student', 'subject', 'month')
+        indexes = [
+            models.Index(fields=['subject', 'month'], name='attendancesummary_subject_idx'),
+        ]
+        verbose_name_plural = 'attendance summaries'
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id} - {self.month:%Y-%m}: {self.present}P/{self.absent}A"
+
+# Archived attendance (closed terms)
+class AttendanceArchiveManager(TeacherSectionsMixin, models.Manager):
+    def archived_keys(self, keys):
+        """
+        The ``(student_id, subject_id, date)`` keys among ``keys`` that
+        already have an archived row. New attendance for them is refused:
+        the summary counts the archived row, so it would be counted twice.
+        """
+        keys = set(keys)
+        if not keys:
+            return set()
+        existing = self.filter(
+            student_id__in={key[0] for key in keys},
+            subject_id__in={key[1] for key in keys},
+            date__in={key[2] for key in keys},
+        ).values_list('student_id', 'subject_id', 'date')
+        return {key for key in existing if key in keys}
+
+
+class AttendanceArchive(models.Model):
+    """
+    Attendance moved out of the hot table by the archive_attendance command.
+
+    Same columns as Attendance and the original primary key, so the
+    attendance serializers read it unchanged. Foreign keys carry no database
+    constraint because the table can be routed to a separate database
+    (``ATTENDANCE_ARCHIVE_DATABASE``); rows are never written by the API.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    subject = models.ForeignKey(TeacherSubject, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    section = models.ForeignKey(Section, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date = models.DateField()
+    status = models.CharField(max_length=1, choices=Attendance.STATUS_CHOICES)
+    taken_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+'
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AttendanceArchiveManager()
+
+    class Meta:
+        unique_together = ('student', 'subject', 'date')
+        indexes = [
+            models.Index(fields=['section', 'date', 'id'], name='attendancearchive_section_idx'),
+            models.Index(fields=['subject', 'date', 'id'], name='attendancearchive_subject_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id} - {self.date} - {self.status} (archived)"
+
 # User Profile
+# With the content-addressed default storage only the extension of this name is kept
 def user_directory_path(instance, filename):
     ext = filename.split('.')[-1]
     filename = f"{uuid4().hex}.{ext}"
@@ -139,6 +422,8 @@ class UserProfile(models.Model):
     location = models.CharField(max_length=255, blank=True, null=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     section = models.ForeignKey(Section, on_delete=models.SET_NULL, null=True, blank=True)
+    # Storage names of the resized copies of profile_image (datingapp.imaging)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -147,9 +432,47 @@ class UserProfile(models.Model):
 
     def profile_image_tag(self):
         if self.profile_image:
+            thumb = self.image_variants.get('sizes', {}).get('thumb', {}).get('webp')
+            url = self.profile_image.storage.url(thumb) if thumb else self.profile_image.url
             return mark_safe(
-                f'<img src="{self.profile_image.url}" width="60" height="60" style="object-fit: cover; border-radius: 5px;" />'
+                f'<img src="{url}" width="60" height="60" style="object-fit: cover; border-radius: 5px;" />'
             )
         return "Image not available"
 
     profile_image_tag.short_description = 'Image'
+
+# Chunked profile image uploads (accounts.uploads)
+class ImageUploadManager(models.Manager):
+    def expired(self):
+        expire_after = settings.CHUNKED_UPLOADS.get('EXPIRE_AFTER', 24 * 3600)
+        return self.filter(updated_at__lt=timezone.now() - timedelta(seconds=expire_after))
+
+
+class ImageUpload(models.Model):
+    """
+    A profile image being received in chunks.
+
+    The bytes live in a temp file named after ``id`` under
+    ``CHUNKED_UPLOADS['DIR']``; ``offset`` is how many of them are on disk,
+    which is where a client resumes after a dropped connection. While a
+    chunk is being written it already points past that chunk (the claim
+    that keeps a second writer out), until uploads.recover() finds it stale.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(help_text="Total bytes announced by the client")
+    offset = models.PositiveIntegerField(default=0)
+    content_type = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImageUploadManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='imageupload_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size}) for {self.user_id}"
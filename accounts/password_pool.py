@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.exceptions import Throttled
+
+
+class LoginBusy(Throttled):
+    default_detail = 'Too many logins in progress, retry shortly.'
+
+
+class PasswordCheckPool:
+    """
+    Bounded thread pool for password verification.
+
+    PBKDF2 (hashlib) and Argon2 (argon2-cffi) release the GIL while hashing,
+    so ``workers`` threads use that many cores. At most ``workers +
+    max_pending`` checks are admitted; beyond that callers wait up to
+    ``wait`` seconds (sync) or are turned away at once (async) with
+    :class:`LoginBusy`, a 429 with Retry-After, instead of piling up.
+    """
+
+    def __init__(self, workers, max_pending, wait):
+        self.wait = wait
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def _call(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    def run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(timeout=self.wait):
+            raise LoginBusy(wait=1)
+        try:
+            return self._executor.submit(self._call, fn, args, kwargs).result()
+        finally:
+            self._slots.release()
+
+    async def arun(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy(wait=1)
+        try:
+            return await asyncio.wrap_future(self._executor.submit(self._call, fn, args, kwargs))
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_password_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = getattr(settings, 'LOGIN_POOL', {})
+                _pool = PasswordCheckPool(
+                    workers=config.get('WORKERS') or os.cpu_count() or 1,
+                    max_pending=config.get('MAX_PENDING', 64),
+                    wait=config.get('WAIT', 2),
+                )
+    return _pool
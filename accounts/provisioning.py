@@ -0,0 +1,207 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import Section, StudentSubject, Subject, UserProfile, Users
+
+ROLES = {value for value, _ in Users.ROLES}
+MIN_PASSWORD_LENGTH = 4  # same rule as RegistrationSerializer
+# Below this many passwords a process pool costs more to start than it saves
+MIN_POOL_SIZE = 32
+
+
+def read_rows(handle, file_format='csv'):
+    """
+    Parse provisioning rows from a text stream.
+
+    CSV needs the columns email, username and password; Role, section and
+    subjects (names separated by ``;``) are optional. JSON is a list of
+    objects with the same keys, where subjects may also be a list.
+    """
+    if file_format == 'json':
+        rows = json.load(handle)
+        if not isinstance(rows, list):
+            raise ValueError("expected a JSON list of users")
+        return rows
+    return list(csv.DictReader(handle))
+
+
+def read_upload(upload):
+    """Rows from an uploaded .csv or .json file."""
+    file_format = 'json' if upload.name.lower().endswith('.json') else 'csv'
+    return read_rows(io.TextIOWrapper(upload, encoding='utf-8-sig'), file_format)
+
+
+def _init_worker(settings_module):
+    # Spawned workers start without Django; forked ones are already set up
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords on a process pool, one worker per core by default.
+
+    Every hasher burns a full core per password, so a class of 2,000
+    students is hashed ``workers`` at a time instead of one after another.
+    Only the management command uses a pool; the API passes ``workers=1``.
+    """
+    passwords = list(passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < MIN_POOL_SIZE:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'datingapp.settings'),),
+    ) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+class Provisioner:
+    """
+    Create users, their profiles and subject assignments in bulk.
+
+    Rows are validated against the model's field validators and lookups
+    loaded once up front, passwords are hashed (in parallel unless
+    ``workers=1``), and each batch is written with three ``bulk_create``
+    calls in one transaction. A batch that hits a unique constraint anyway
+    (another writer took the email meanwhile) is retried row by row, so
+    only the clashing rows fail. ``run`` returns one result per input row:
+    ``{'row', 'email', 'status': 'created', 'id'}`` or
+    ``{'row', 'email', 'status': 'error', 'errors': [...]}``.
+    """
+
+    def __init__(self, workers=None, batch_size=500):
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def run(self, rows):
+        rows = list(rows)
+        self.load_lookups(rows)
+        results = [None] * len(rows)
+        valid = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results[index] = {'row': index + 1, 'email': None, 'status': 'error', 'errors': ["expected an object"]}
+                continue
+            cleaned, errors = self.clean(row)
+            if errors:
+                results[index] = {
+                    'row': index + 1, 'email': cleaned.get('email'), 'status': 'error', 'errors': errors,
+                }
+            else:
+                valid.append((index, cleaned))
+
+        hashes = hash_passwords((cleaned['password'] for _, cleaned in valid), self.workers)
+        for start in range(0, len(valid), self.batch_size):
+            batch = valid[start:start + self.batch_size]
+            try:
+                created = self.write(batch, hashes[start:start + self.batch_size])
+            except IntegrityError:
+                self.write_each(batch, hashes[start:start + self.batch_size], results)
+                continue
+            for (index, cleaned), user in zip(batch, created):
+                results[index] = {'row': index + 1, 'email': cleaned['email'], 'status': 'created', 'id': user.pk}
+        return results
+
+    def write_each(self, batch, hashes, results):
+        for (index, cleaned), encoded in zip(batch, hashes):
+            try:
+                user, = self.write([(index, cleaned)], [encoded])
+            except IntegrityError:
+                results[index] = {
+                    'row': index + 1, 'email': cleaned['email'], 'status': 'error',
+                    'errors': ["email or username already exists"],
+                }
+            else:
+                results[index] = {'row': index + 1, 'email': cleaned['email'], 'status': 'created', 'id': user.pk}
+
+    def load_lookups(self, rows):
+        """Fetch every existing email, username, section and subject the rows mention."""
+        rows = [row for row in rows if isinstance(row, dict)]
+        emails = {Users.objects.normalize_email(str(row.get('email') or '').strip()) for row in rows}
+        usernames = {str(row.get('username') or '').strip() for row in rows}
+        self.taken_emails = set(Users.objects.filter(email__in=emails).values_list('email', flat=True))
+        self.taken_usernames = set(Users.objects.filter(username__in=usernames).values_list('username', flat=True))
+        self.sections = dict(Section.objects.values_list('name', 'id'))
+        self.subjects = dict(Subject.objects.values_list('subject_name', 'id'))
+
+    def clean(self, row):
+        def value(name, default=''):
+            return str(row.get(name) or default).strip()
+
+        errors = []
+        cleaned = {
+            'email': Users.objects.normalize_email(value('email')),
+            'username': value('username'),
+            'password': str(row.get('password') or ''),
+            'Role': value('Role') or value('role') or 'user',
+        }
+        if not cleaned['email']:
+            errors.append("email is required")
+        elif cleaned['email'] in self.taken_emails:
+            errors.append(f"email {cleaned['email']!r} already exists")
+        if not cleaned['username']:
+            errors.append("username is required")
+        elif cleaned['username'] in self.taken_usernames:
+            errors.append(f"username {cleaned['username']!r} already exists")
+        for name in ('email', 'username'):
+            if cleaned[name]:
+                try:
+                    Users._meta.get_field(name).run_validators(cleaned[name])
+                except ValidationError as exc:
+                    errors.extend(f"{name}: {message}" for message in exc.messages)
+        if len(cleaned['password']) < MIN_PASSWORD_LENGTH:
+            errors.append(f"password should have at least {MIN_PASSWORD_LENGTH} characters")
+        if cleaned['Role'] not in ROLES:
+            errors.append(f"invalid Role {cleaned['Role']!r}")
+
+        section = value('section')
+        cleaned['section_id'] = self.sections.get(section) if section else None
+        if section and cleaned['section_id'] is None:
+            errors.append(f"unknown section {section!r}")
+
+        subjects = row.get('subjects') or []
+        if isinstance(subjects, str):
+            subjects = subjects.split(';')
+        cleaned['subject_ids'] = []
+        for name in filter(None, (str(subject).strip() for subject in subjects)):
+            if name not in self.subjects:
+                errors.append(f"unknown subject {name!r}")
+            elif self.subjects[name] not in cleaned['subject_ids']:
+                cleaned['subject_ids'].append(self.subjects[name])
+
+        if not errors:
+            # Claim the email and username so later rows in the same upload clash
+            self.taken_emails.add(cleaned['email'])
+            self.taken_usernames.add(cleaned['username'])
+        return cleaned, errors
+
+    def write(self, batch, hashes):
+        with transaction.atomic():
+            users = Users.objects.bulk_create([
+                Users(email=cleaned['email'], username=cleaned['username'], Role=cleaned['Role'], password=encoded)
+                for (_, cleaned), encoded in zip(batch, hashes)
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, section_id=cleaned['section_id'])
+                for (_, cleaned), user in zip(batch, users)
+            ])
+            StudentSubject.objects.bulk_create([
+                StudentSubject(student=user, subject_id=subject_id)
+                for (_, cleaned), user in zip(batch, users)
+                for subject_id in cleaned['subject_ids']
+            ])
+        return users
+
+
+def provision_users(rows, workers=None, batch_size=500):
+    return Provisioner(workers=workers, batch_size=batch_size).run(rows)
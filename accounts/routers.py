@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+def archive_database():
+    return getattr(settings, 'ATTENDANCE_ARCHIVE_DATABASE', DEFAULT_DB_ALIAS)
+
+
+class AttendanceArchiveRouter:
+    """Send AttendanceArchive to ATTENDANCE_ARCHIVE_DATABASE; leave everything else alone."""
+
+    def _is_archive(self, model):
+        return model._meta.label == 'accounts.AttendanceArchive'
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model):
+            return archive_database()
+        # Related users/subjects/sections of an archived row live in the main database
+        instance = hints.get('instance')
+        if instance is not None and self._is_archive(type(instance)):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_archive(type(obj1)) or self._is_archive(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive = archive_database()
+        if app_label == 'accounts' and model_name == 'attendancearchive':
+            return db == archive
+        if db == archive and archive != DEFAULT_DB_ALIAS:
+            return False
+        return None
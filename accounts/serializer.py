@@ -85,13 +85,16 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 # serializer.py
 
 from .models import UserProfile
+from datingapp.imaging import variant_urls
 
 class UserProfileSerializer(serializers.ModelSerializer):
     profile_image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
-        fields = ['bio', 'birth_date', 'location', 'phone_number', 'profile_image', 'profile_image_url']
+        fields = ['bio', 'birth_date', 'location', 'phone_number', 'profile_image', 'profile_image_url',
+                  'image_variants']
 
     def get_profile_image_url(self, obj):
         request = self.context.get('request')
@@ -99,6 +102,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.profile_image.url)
         return None
 
+    def get_image_variants(self, obj):
+        # {"thumb": {"webp": url, "jpeg": url}, ...}; empty until the background resize finishes
+        return variant_urls(obj, 'profile_image', self.context.get('request'))
+
     def create(self, validated_data):
         user = self.context['request'].user
         return UserProfile.objects.create(user=user, **validated_data)
@@ -176,11 +183,14 @@ from rest_framework import serializers
 from .models import Attendance
 
 from rest_framework import serializers
-from .models import Attendance, TeacherSubject, Section
+from .models import Attendance, AttendanceArchive, TeacherSubject, Section
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
 User = get_user_model()
 
+ARCHIVED_MESSAGE = "Attendance for this student, subject and date is archived and can no longer change."
+
 class AttendanceSerializer(serializers.ModelSerializer):
     # For read, expand related fields; for write, accept IDs
     student = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(Role='user'))
@@ -204,6 +214,8 @@ class AttendanceSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You are not assigned to this subject.")
         if subject.section != section:
             raise serializers.ValidationError("Subject does not belong to the specified section.")
+        if AttendanceArchive.objects.archived_keys([(data['student'].pk, subject.pk, data['date'])]):
+            raise serializers.ValidationError(ARCHIVED_MESSAGE)
 
         # Additional validation can be added here as needed
 
@@ -221,4 +233,129 @@ class AttendanceSerializer(serializers.ModelSerializer):
                 'taken_by': self.context['request'].user,
             }
         )
-        return attendance_obj
\ No newline at end of file
+        return attendance_obj
+
+
+class AttendanceFilterSerializer(serializers.Serializer):
+    """Validates the query-string filters accepted by the attendance listing."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    section = serializers.IntegerField(required=False)
+    subject = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES, required=False)
+    archived = serializers.BooleanField(default=False, help_text="Read closed terms from the archive table")
+
+    def get_model(self):
+        return AttendanceArchive if self.validated_data['archived'] else Attendance
+
+    def filter_queryset(self, queryset):
+        filters = self.validated_data
+        if 'date_from' in filters:
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            queryset = queryset.filter(date__lte=filters['date_to'])
+        if 'section' in filters:
+            queryset = queryset.filter(section_id=filters['section'])
+        if 'subject' in filters:
+            queryset = queryset.filter(subject_id=filters['subject'])
+        if 'status' in filters:
+            queryset = queryset.filter(status=filters['status'])
+        return queryset
+
+
+# Attendance rollups
+class AttendanceSummaryFilterSerializer(serializers.Serializer):
+    student = serializers.IntegerField(required=False)
+    subject = serializers.IntegerField(required=False)
+    by = serializers.ChoiceField(choices=['total', 'month'], default='total')
+
+
+class AttendanceSummarySerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    subject = serializers.IntegerField()
+    month = serializers.DateField(required=False)
+    present = serializers.IntegerField()
+    absent = serializers.IntegerField()
+    total = serializers.SerializerMethodField()
+    percentage = serializers.SerializerMethodField()
+
+    def get_total(self, obj):
+        return obj['present'] + obj['absent']
+
+    def get_percentage(self, obj):
+        total = self.get_total(obj)
+        return round(100 * obj['present'] / total, 2) if total else None
+
+
+# Bulk attendance ingestion: one query per referenced model, one upsert per batch
+class AttendanceRecordSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    subject = serializers.IntegerField()
+    section = serializers.IntegerField()
+    date = serializers.DateField()
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+
+
+class AttendanceBulkSerializer(serializers.ListSerializer):
+    child = AttendanceRecordSerializer()
+    does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+    def to_internal_value(self, data):
+        rows = super().to_internal_value(data)
+        user = self.context['request'].user
+
+        student_ids = set(
+            User.objects.filter(Role='user', pk__in={row['student'] for row in rows})
+            .values_list('pk', flat=True)
+        )
+        section_ids = set(
+            Section.objects.filter(pk__in={row['section'] for row in rows})
+            .values_list('pk', flat=True)
+        )
+        # TeacherSubject id -> (teacher_id, section_id), checked once per distinct subject
+        subjects = {
+            pk: (teacher_id, section_id)
+            for pk, teacher_id, section_id in TeacherSubject.objects.filter(
+                pk__in={row['subject'] for row in rows}
+            ).values_list('pk', 'teacher_id', 'section_id')
+        }
+
+        archived = AttendanceArchive.objects.archived_keys(
+            (row['student'], row['subject'], row['date']) for row in rows
+        )
+
+        errors = []
+        for row in rows:
+            row_errors = {}
+            for field, known in (('student', student_ids), ('section', section_ids), ('subject', subjects)):
+                if row[field] not in known:
+                    row_errors[field] = [self.does_not_exist.format(pk_value=row[field])]
+            if not row_errors:
+                teacher_id, section_id = subjects[row['subject']]
+                if teacher_id != user.pk:
+                    row_errors['non_field_errors'] = ["You are not assigned to this subject."]
+                elif section_id != row['section']:
+                    row_errors['non_field_errors'] = ["Subject does not belong to the specified section."]
+                elif (row['student'], row['subject'], row['date']) in archived:
+                    row_errors['non_field_errors'] = [ARCHIVED_MESSAGE]
+            errors.append(row_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        records = [
+            Attendance(
+                student_id=row['student'],
+                subject_id=row['subject'],
+                section_id=row['section'],
+                date=row['date'],
+                status=row['status'],
+                taken_by=user,
+            )
+            for row in validated_data
+        ]
+        with transaction.atomic():
+            return Attendance.objects.bulk_upsert(records)
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_cached_user
+from .blacklist import remember_blacklisted
+from datingapp.imaging import schedule_variants
+
+from .models import Attendance, AttendanceSummary, UserProfile, Users, archiving_attendance
+
+
+def _summary_key(attendance):
+    return (attendance.student_id, attendance.subject_id, attendance.date, attendance.status)
+
+
+# Keep AttendanceSummary in step with single-row writes (serializer create, admin).
+# Attendance.objects.bulk_upsert updates the summary itself since bulk_create sends no signals.
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, raw=False, **kwargs):
+    instance._summary_previous = None
+    if instance.pk and not raw:
+        instance._summary_previous = (
+            Attendance.objects.filter(pk=instance.pk)
+            .values_list('student_id', 'subject_id', 'date', 'status')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Attendance)
+def count_saved_attendance(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    AttendanceSummary.objects.apply_changes([(instance._summary_previous, _summary_key(instance))])
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_deleted_attendance(sender, instance, origin=None, **kwargs):
+    # Cascades from a student or TeacherSubject take their summary rows with them
+    if origin is not None and getattr(origin, 'model', type(origin)) is not Attendance:
+        return
+    # Rows moved to the archive stay counted
+    if archiving_attendance.get():
+        return
+    AttendanceSummary.objects.apply_changes([(_summary_key(instance), None)])
+
+
+# Drop users from the authentication cache whenever they change (profile
+# updates, admin edits, deactivation, password changes) or are deleted.
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def forget_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+# Feed newly blacklisted refresh tokens into this process's Bloom filter
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        remember_blacklisted(instance.token.jti)
+
+
+# Resize new profile images in the background once the upload is committed
+@receiver(post_save, sender=UserProfile)
+def build_profile_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'profile_image')
@@ -1,3 +1,1079 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import re
+import tempfile
+import time
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt import authentication as jwt_authentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken, SlidingToken
+
+from datingapp import imaging
+from datingapp.imaging import variant_names
+from datingapp.storage import collect_garbage
+
+from . import authentication, blacklist, compaction, password_pool, uploads
+from .models import (
+    Attendance, AttendanceArchive, AttendanceSummary, ImageUpload, Section, Subject, TeacherSubject, UserProfile,
+    Users,
+)
+from .provisioning import Provisioner
+
+
+class AttendanceFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Users.objects.create_user('teacher@example.com', 'teacher', 'pw', Role='teacher')
+        cls.section = Section.objects.create(name='A')
+        cls.other_section = Section.objects.create(name='B')
+        subject = Subject.objects.create(subject_name='Math')
+        cls.teacher_subject = TeacherSubject.objects.create(
+            subject=subject, section=cls.section, teacher=cls.teacher, subject_time='09:00'
+        )
+        cls.other_teacher_subject = TeacherSubject.objects.create(
+            subject=subject, section=cls.other_section, teacher=cls.teacher, subject_time='10:00'
+        )
+        students = [
+            Users.objects.create_user(f'student{number}@example.com', f'student{number}', 'pw', Role='user')
+            for number in range(3)
+        ]
+        # Interleaved dates across both sections, so a page has to merge them
+        Attendance.objects.bulk_create([
+            Attendance(
+                student=student, subject=teacher_subject, section=teacher_subject.section,
+                date=datetime.date(2025, 1, 1) + datetime.timedelta(days=day), status='P',
+            )
+            for day in range(40)
+            for student in students
+            for teacher_subject in (cls.teacher_subject, cls.other_teacher_subject)
+            if (day + teacher_subject.section_id) % 3
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def listing_queries(self, params):
+        """(sql, params) of every attendance query AttendanceView sends for ``params``."""
+        queries = []
+
+        def capture(execute, sql, sql_params, many, context):
+            if 'accounts_attendance' in sql:
+                queries.append((sql, sql_params))
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get('/api/accounts/attendance/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return queries
+
+
+class AttendanceListingTests(AttendanceFixtureMixin, TestCase):
+    def test_pages_merge_sections_in_order(self):
+        expected = list(
+            Attendance.objects.filter(section__in=[self.section, self.other_section])
+            .order_by('-date', '-id').values_list('id', flat=True)
+        )
+        seen = []
+        url, params = '/api/accounts/attendance/', {'page_size': 25}
+        while url:
+            response = self.client.get(url, params)
+            seen += [row['id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(seen, expected)
+
+    def test_one_seek_per_section(self):
+        self.assertEqual(len(self.listing_queries({'page_size': 25})), 2)
+        self.assertEqual(len(self.listing_queries({'section': self.section.pk})), 1)
+
+
+class AttendanceBulkWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Users.objects.create_user('teacher@example.com', 'teacher', 'pw', Role='teacher')
+        cls.section = Section.objects.create(name='A')
+        cls.teacher_subject = TeacherSubject.objects.create(
+            subject=Subject.objects.create(subject_name='Math'), section=cls.section,
+            teacher=cls.teacher, subject_time='09:00',
+        )
+        cls.students = [
+            Users.objects.create_user(f'student{number}@example.com', f'student{number}', 'pw', Role='user')
+            for number in range(6)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def submit(self, marks):
+        """POST ``(student, status)`` marks for one day; the response must be a 201."""
+        rows = [
+            {'student': student.pk, 'subject': self.teacher_subject.pk, 'section': self.section.pk,
+             'date': '2025-03-03', 'status': status}
+            for student, status in marks
+        ]
+        response = self.client.post('/api/accounts/attendance/', rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def counts(self):
+        return list(
+            AttendanceSummary.objects.order_by('student_id').values_list('student_id', 'present', 'absent')
+        )
+
+    def test_insert_then_update_on_conflict(self):
+        first, second, third = self.students[:3]
+        self.submit([(first, 'P'), (second, 'P')])
+        self.submit([(second, 'A'), (third, 'A')])
+
+        self.assertEqual(
+            sorted(Attendance.objects.values_list('student_id', 'status')),
+            [(first.pk, 'P'), (second.pk, 'A'), (third.pk, 'A')],
+        )
+        # The overwritten present mark is backed out of the rollup, not added to it
+        self.assertEqual(self.counts(), [(first.pk, 1, 0), (second.pk, 0, 1), (third.pk, 0, 1)])
+
+    def test_duplicate_keys_in_one_submission_keep_the_last(self):
+        student = self.students[0]
+        self.submit([(student, 'P'), (student, 'A')])
+        self.assertEqual(list(Attendance.objects.values_list('status', flat=True)), ['A'])
+        self.assertEqual(self.counts(), [(student.pk, 0, 1)])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def queries(students, status):
+            with CaptureQueriesContext(connection) as captured:
+                self.submit([(student, status) for student in students])
+            return len(captured)
+
+        # Inserts, then updates of existing rows
+        self.assertEqual(queries(self.students[:1], 'P'), queries(self.students, 'P'))
+        self.assertEqual(queries(self.students[:1], 'A'), queries(self.students, 'A'))
+
+    def test_summary_rows_are_locked_before_attendance_is_read(self):
+        statements = []
+
+        def capture(execute, sql, sql_params, many, context):
+            statements.append(sql)
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(capture):
+            self.submit([(self.students[0], 'P')])
+        first_summary_write = next(
+            index for index, sql in enumerate(statements) if re.match(r'INSERT .*INTO "accounts_attendancesummary"', sql)
+        )
+        attendance_read = next(
+            index for index, sql in enumerate(statements)
+            if sql.startswith('SELECT') and 'FROM "accounts_attendance"' in sql
+        )
+        # A concurrent first submission of the same key blocks on that write, then sees this one's row
+        self.assertLess(first_summary_write, attendance_read)
+        if connection.features.has_select_for_update:
+            self.assertTrue(any(
+                'FROM "accounts_attendancesummary"' in sql and 'FOR UPDATE' in sql
+                for sql in statements[:attendance_read]
+            ))
+
+    def test_summary_batches_stay_under_parameter_limit(self):
+        changes = [
+            (None, (student.pk, self.teacher_subject.pk, datetime.date(2000 + year, 1, 1), 'P'))
+            for student in self.students
+            for year in range(50)
+        ]
+        updates = []
+
+        def capture(execute, sql, sql_params, many, context):
+            if sql.startswith('UPDATE'):
+                updates.append(len(sql_params))
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(capture):
+            AttendanceSummary.objects.apply_changes(changes)
+        self.assertLessEqual(max(updates), connection.features.max_query_params)
+        self.assertEqual(AttendanceSummary.objects.filter(present=1).count(), len(changes))
+
+
+class AttendanceSummaryMigrationTests(TransactionTestCase):
+    before = [('accounts', '0002_attendance_indexes')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        # Attendance written before 0003 added the summary table
+        apps = self.migrate(self.before)
+        user = apps.get_model('accounts', 'Users')
+        teacher = user.objects.create(email='teacher@example.com', username='teacher', Role='teacher')
+        student = user.objects.create(email='student@example.com', username='student', Role='user')
+        section = apps.get_model('accounts', 'Section').objects.create(name='A')
+        teacher_subject = apps.get_model('accounts', 'TeacherSubject').objects.create(
+            subject=apps.get_model('accounts', 'Subject').objects.create(subject_name='Math'),
+            section=section, teacher=teacher, subject_time='09:00',
+        )
+        apps.get_model('accounts', 'Attendance').objects.bulk_create([
+            apps.get_model('accounts', 'Attendance')(
+                student=student, subject=teacher_subject, section=section,
+                date=datetime.date(2025, 8, day), status=status,
+            )
+            for day, status in ((1, 'P'), (2, 'P'), (3, 'A'))
+        ])
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def counts(self):
+        return list(AttendanceSummary.objects.values_list('month', 'present', 'absent'))
+
+    def test_existing_rows_are_counted(self):
+        self.assertEqual(self.counts(), [(datetime.date(2025, 8, 1), 2, 1)])
+
+    def test_existing_rows_can_be_edited_and_deleted(self):
+        first, second, third = Attendance.objects.order_by('date')
+        first.status = 'A'
+        first.save()
+        second.delete()
+        third.delete()
+        self.assertEqual(self.counts(), [(datetime.date(2025, 8, 1), 0, 1)])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "query plans are checked against SQLite")
+class AttendanceQueryPlanTests(AttendanceFixtureMixin, TestCase):
+    """Fail if an attendance access path stops being served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexed(self, plan, index):
+        # No table or index scan, no sort of the matching rows, and the index meant for it
+        self.assertEqual(re.findall(r'\bSCAN \S+.*', plan), [], plan)
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+        self.assertIn(f'USING INDEX {index} ', plan, plan)
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_teacher_listing(self):
+        for query in self.listing_queries({'page_size': 25}):
+            self.assertIndexed(self.explain(*query), 'attendance_section_date_idx')
+
+    def test_teacher_listing_deep_page(self):
+        next_page = self.client.get('/api/accounts/attendance/', {'page_size': 25}).data['next']
+        cursor = parse_qs(urlsplit(next_page).query)['cursor'][0]
+        for query in self.listing_queries({'page_size': 25, 'cursor': cursor}):
+            self.assertIndexed(self.explain(*query), 'attendance_section_date_idx')
+
+    def test_section_and_date(self):
+        self.assertIndexed(
+            Attendance.objects.filter(section=self.section, date__gte='2025-01-01').order_by('-date', '-id').explain(),
+            'attendance_section_date_idx',
+        )
+
+    def test_teacher_subject_and_date(self):
+        self.assertIndexed(
+            Attendance.objects.filter(subject=self.teacher_subject, date__gte='2025-01-01')
+            .order_by('-date', '-id').explain(),
+            'attendance_subject_date_idx',
+        )
+
+    def test_filtered_teacher_listing(self):
+        params = {'section': self.section.pk, 'date_from': '2025-01-01', 'date_to': '2025-06-30'}
+        for query in self.listing_queries(params):
+            self.assertIndexed(self.explain(*query), 'attendance_section_date_idx')
+
+
+class AttendanceExportTests(AttendanceFixtureMixin, TestCase):
+    def test_command_filters_on_status(self):
+        absent = Attendance.objects.filter(date=datetime.date(2025, 1, 2))
+        absent.update(status='A')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'absent.csv')
+            call_command('export_attendance', '--status', 'A', '--output', path)
+            with open(path, newline='') as handle:
+                lines = handle.read().splitlines()
+        self.assertEqual(len(lines) - 1, absent.count())
+
+        # Same rows as the API export with ?status=A
+        self.client.force_authenticate(Users.objects.create_superuser('admin@example.com', 'admin', 'pw'))
+        response = self.client.get('/api/accounts/attendance/export/', {'status': 'A'})
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), lines)
+
+
+class AttendanceArchiveTests(AttendanceFixtureMixin, TestCase):
+    def summary(self):
+        return sorted(AttendanceSummary.objects.values_list('student_id', 'subject_id', 'month', 'present', 'absent'))
+
+    def archive(self, before='2025-01-20'):
+        call_command('archive_attendance', before=before, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_rollups_survive_archiving_and_rebuild(self):
+        AttendanceSummary.objects.rebuild()
+        counted = self.summary()
+        self.archive()
+        self.assertFalse(Attendance.objects.filter(date__lt='2025-01-20').exists())
+        self.assertEqual(self.summary(), counted)
+        AttendanceSummary.objects.rebuild()
+        self.assertEqual(self.summary(), counted)
+
+    def test_row_colliding_with_archived_key_is_kept(self):
+        row = Attendance.objects.order_by('date', 'id').first()
+        AttendanceArchive.objects.create(
+            id=10 ** 6, student_id=row.student_id, subject_id=row.subject_id, section_id=row.section_id,
+            date=row.date, status='A',
+        )
+        self.archive()
+        self.assertTrue(Attendance.objects.filter(pk=row.pk).exists())
+        self.assertEqual(Attendance.objects.filter(date__lt='2025-01-20').count(), 1)
+
+    def test_new_attendance_for_archived_key_is_refused(self):
+        self.archive()
+        archived = AttendanceArchive.objects.filter(section=self.section).first()
+        response = self.client.post('/api/accounts/attendance/', [{
+            'student': archived.student_id, 'subject': archived.subject_id, 'section': archived.section_id,
+            'date': archived.date.isoformat(), 'status': 'A',
+        }], format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertFalse(Attendance.objects.filter(student=archived.student_id, date=archived.date).exists())
+
+
+class AttendanceImportTests(TestCase):
+    header = 'student,subject,section,date,status,teacher,taken_by'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Users.objects.create_user('teacher@example.com', 'teacher', 'pw', Role='teacher')
+        cls.other_teacher = Users.objects.create_user('other@example.com', 'other', 'pw', Role='teacher')
+        cls.student = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+        section = Section.objects.create(name='A')
+        math = Subject.objects.create(subject_name='Math')
+        art = Subject.objects.create(subject_name='Art')
+        cls.math = TeacherSubject.objects.create(subject=math, section=section, teacher=cls.teacher, subject_time='09:00')
+        # Art in section A has two teachers, so its rows need a teacher column
+        cls.art = TeacherSubject.objects.create(subject=art, section=section, teacher=cls.teacher, subject_time='10:00')
+        TeacherSubject.objects.create(subject=art, section=section, teacher=cls.other_teacher, subject_time='11:00')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'attendance.csv')
+
+    def run_import(self, *rows, args=()):
+        with open(self.path, 'w', newline='') as handle:
+            handle.write('\n'.join([self.header, *rows]) + '\n')
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_attendance', self.path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_names_are_resolved(self):
+        self.run_import(
+            'student,Math,A,2025-01-02,present,,',
+            'student,Art,A,2025-01-02,a,teacher,other',
+        )
+        self.assertEqual(
+            sorted(Attendance.objects.values_list('student', 'subject', 'section__name', 'date', 'status', 'taken_by')),
+            [
+                (self.student.pk, self.math.pk, 'A', datetime.date(2025, 1, 2), 'P', self.teacher.pk),
+                (self.student.pk, self.art.pk, 'A', datetime.date(2025, 1, 2), 'A', self.other_teacher.pk),
+            ],
+        )
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        stdout, stderr = self.run_import(
+            'nobody,Math,A,2025-01-02,P,,',
+            'student,Math,Z,2025-01-02,P,,',
+            'student,Art,A,2025-01-02,P,,',
+            'student,Math,A,2025-01-02,late,,',
+            'student,Math,A,02/01/2025,P,,',
+            'student,Math,A,2025-01-03,P,,',
+            args=['--max-reported-errors', '4'],
+        )
+        self.assertEqual(stderr.splitlines(), [
+            f"{self.path}:2: unknown student 'nobody'",
+            f"{self.path}:3: unknown section 'Z'",
+            f"{self.path}:4: more than one TeacherSubject for 'Art' in section 'A', add a teacher column",
+            f"{self.path}:5: invalid status 'late'",
+        ])
+        self.assertIn('Done: 1 rows written, 5 invalid, 0 skipped', stdout)
+        self.assertEqual(list(Attendance.objects.values_list('date', flat=True)), [datetime.date(2025, 1, 3)])
+
+    def test_failed_batch_can_be_resumed_with_skip(self):
+        rows = [f'student,Math,A,2025-01-0{day},P,,' for day in range(1, 6)]
+        bulk_upsert = Attendance.objects.bulk_upsert
+        calls = []
+
+        def fail_second_batch(batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise DatabaseError('database is locked')
+            return bulk_upsert(batch)
+
+        with mock.patch.object(Attendance.objects, 'bulk_upsert', side_effect=fail_second_batch):
+            with self.assertRaisesMessage(CommandError, f'resume with: --skip 2 {self.path}'):
+                self.run_import(*rows, args=['--batch-size', '2'])
+        self.assertEqual(Attendance.objects.count(), 2)
+
+        stdout, _ = self.run_import(*rows, args=['--batch-size', '2', '--skip', '2'])
+        self.assertIn('Done: 3 rows written, 0 invalid, 2 skipped', stdout)
+        self.assertEqual(Attendance.objects.count(), 5)
+
+
+class ProfileImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+        cls.png = buffer.getvalue()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(directory.name, 'media'),
+            CHUNKED_UPLOADS={**settings.CHUNKED_UPLOADS, 'DIR': os.path.join(directory.name, 'uploads')},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, size=None):
+        response = self.client.post(
+            '/api/accounts/profile/image/uploads/', {'filename': 'me.png', 'size': size or len(self.png)}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return ImageUpload.objects.get(pk=response.data['id']), response.data['url']
+
+    def send(self, url, offset, chunk):
+        return self.client.generic(
+            'PATCH', url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def file_bytes(self, upload):
+        with open(uploads.temp_path(upload), 'rb') as handle:
+            return handle.read()
+
+    def test_resume_after_partial_chunk(self):
+        upload, url = self.start()
+        self.assertEqual(self.send(url, 0, self.png[:20])['Upload-Offset'], '20')
+        self.assertEqual(self.client.get(url)['Upload-Offset'], '20')
+        response = self.send(url, 20, self.png[20:])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(ImageUpload.objects.filter(pk=upload.pk).exists())
+        self.user.profile.refresh_from_db()
+        with self.user.profile.profile_image.open('rb') as image:
+            self.assertEqual(image.read(), self.png)
+
+    def test_offset_mismatch_writes_nothing(self):
+        upload, url = self.start()
+        self.send(url, 0, self.png[:20])
+        response = self.send(url, 10, b'x' * 10)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.file_bytes(upload), self.png[:20])
+
+    def test_losing_a_race_for_the_offset_writes_nothing(self):
+        upload, _ = self.start()
+        stale = ImageUpload.objects.get(pk=upload.pk)
+        uploads.append(upload, 0, io.BytesIO(self.png[:20]), 20)
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.append(stale, 0, io.BytesIO(b'x' * 20), 20)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(self.file_bytes(upload), self.png[:20])
+
+    def test_non_image_is_refused_before_writing(self):
+        upload, url = self.start(size=100)
+        response = self.send(url, 0, b'MZ' + b'\0' * 30)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(ImageUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(os.path.exists(uploads.temp_path(upload)))
+
+    def kill_mid_chunk(self, upload, age):
+        """Leave ``upload`` as a worker killed after claiming the rest of the file would."""
+        ImageUpload.objects.filter(pk=upload.pk).update(
+            offset=upload.size, updated_at=timezone.now() - datetime.timedelta(seconds=age)
+        )
+
+    def test_stale_claim_resumes_from_bytes_on_disk(self):
+        upload, url = self.start()
+        self.send(url, 0, self.png[:20])
+        self.kill_mid_chunk(upload, age=60)
+        self.assertEqual(self.client.get(url)['Upload-Offset'], '20')
+        response = self.send(url, 20, self.png[20:])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.user.profile.refresh_from_db()
+        with self.user.profile.profile_image.open('rb') as image:
+            self.assertEqual(image.read(), self.png)
+
+    def test_stale_claim_is_recovered_on_patch(self):
+        upload, url = self.start()
+        self.send(url, 0, self.png[:20])
+        self.kill_mid_chunk(upload, age=60)
+        response = self.send(url, 20, self.png[20:])
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_live_claim_is_kept(self):
+        upload, url = self.start()
+        self.send(url, 0, self.png[:20])
+        self.kill_mid_chunk(upload, age=0)
+        self.assertEqual(self.client.get(url)['Upload-Offset'], str(len(self.png)))
+        self.assertEqual(self.send(url, 20, self.png[20:]).status_code, 409)
+
+    def test_writer_stops_once_its_claim_is_recovered(self):
+        size = uploads.READ_BLOCK * 2
+        upload, _ = self.start(size=size)
+        body = self.png[:20] + b'x' * (size - 20)
+
+        class ResumedElsewhere(io.BytesIO):
+            # Another request recovers the claim while this one waits for more bytes
+            recovered_at = None
+
+            def read(self, size=-1):
+                if self.recovered_at is None and self.tell() >= uploads.READ_BLOCK:
+                    self.recovered_at = self.tell()
+                    ImageUpload.objects.filter(pk=upload.pk).update(offset=20)
+                return super().read(size)
+
+        stream = ResumedElsewhere(body)
+        with override_settings(CHUNKED_UPLOADS={**settings.CHUNKED_UPLOADS, 'STALE_AFTER': 0}):
+            with self.assertRaises(uploads.UploadError) as raised:
+                uploads.append(upload, 0, stream, size)
+        self.assertEqual(raised.exception.status, 409)
+        # Nothing read after the claim was lost reached the file
+        self.assertEqual(self.file_bytes(upload), body[:stream.recovered_at])
+
+
+class TempMediaMixin:
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = storages['default']
+
+    def age(self, name, seconds=2 * 3600):
+        past = time.time() - seconds
+        os.utime(self.storage.path(name), (past, past))
+
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+
+    def blob_files(self):
+        root = self.storage.path('cas')
+        return sorted(
+            os.path.relpath(os.path.join(directory, filename), root)
+            for directory, _, filenames in os.walk(root) for filename in filenames
+        )
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('profile_images/me.png', ContentFile(b'same bytes'))
+        second = self.storage.save('products/other.PNG', ContentFile(b'same bytes'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(self.blob_files(), [first[len('cas/'):]])
+        # Blobs may be shared, so deleting a name leaves the bytes for gc_media
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+
+    def test_gc_keeps_referenced_blobs(self):
+        image = self.storage.save('me.png', ContentFile(b'profile image'))
+        variant = self.storage.save('me_thumb.webp', ContentFile(b'thumbnail'))
+        orphan = self.storage.save('old.png', ContentFile(b'replaced image'))
+        UserProfile.objects.create(
+            user=self.user, profile_image=image, image_variants={'source': image, 'sizes': {'thumb': {'webp': variant}}},
+        )
+        for name in (image, variant, orphan):
+            self.age(name)
+
+        report = collect_garbage()
+        self.assertEqual((report.blobs, report.references, report.deleted), (3, 2, 1))
+        self.assertEqual(report.freed_bytes, len(b'replaced image'))
+        self.assertTrue(self.storage.exists(image))
+        self.assertTrue(self.storage.exists(variant))
+        self.assertFalse(self.storage.exists(orphan))
+
+    def test_gc_spares_young_blobs(self):
+        orphan = self.storage.save('new.png', ContentFile(b'reference still in flight'))
+        self.assertEqual(collect_garbage(grace=3600).deleted, 0)
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertEqual(collect_garbage(grace=3600, dry_run=True).deleted, 0)
+        self.age(orphan)
+        self.assertEqual(collect_garbage(grace=3600, dry_run=True).deleted, 1)
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertEqual(collect_garbage(grace=3600).deleted, 1)
+        self.assertFalse(self.storage.exists(orphan))
+
+
+class ImageVariantTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+
+    @staticmethod
+    def photo(color='red'):
+        """A 600x300 JPEG whose EXIF says to rotate it upright, plus a camera tag."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 300), color).save(buffer, 'JPEG', exif=exif.tobytes())
+        return buffer.getvalue()
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(IMAGE_VARIANTS={**settings.IMAGE_VARIANTS, 'ASYNC': False})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, profile=None, color='red'):
+        profile = profile or UserProfile(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_image = ContentFile(self.photo(color), name='me.jpg')
+            profile.save()
+        profile.refresh_from_db()
+        return profile
+
+    def test_variants_are_built_at_the_configured_sizes(self):
+        profile = self.upload()
+        self.assertEqual(profile.image_variants['source'], profile.profile_image.name)
+        sizes = profile.image_variants['sizes']
+        self.assertEqual(set(sizes), {'thumb', 'medium'})
+        for name, expected in (('thumb', (120, 120)), ('medium', (300, 480))):
+            self.assertEqual(set(sizes[name]), {'webp', 'jpeg'})
+            for file_format, stored in sizes[name].items():
+                with self.subTest(variant=name, format=file_format), Image.open(self.storage.path(stored)) as image:
+                    self.assertEqual(image.format, file_format.upper())
+                    # Orientation applied before cropping: the upright photo is 300x600
+                    self.assertEqual(image.size, expected)
+
+    def test_metadata_is_stripped(self):
+        profile = self.upload()
+        for stored in variant_names(profile.image_variants):
+            with self.subTest(stored=stored), Image.open(self.storage.path(stored)) as image:
+                self.assertEqual(dict(image.getexif()), {})
+                self.assertNotIn('exif', image.info)
+
+    def test_replaced_image_is_skipped(self):
+        profile = self.upload()
+        source = profile.profile_image.name
+        profile = self.upload(profile, color='blue')
+
+        # A job queued for the first upload finishes after the second: it must not touch the row
+        current = profile.image_variants
+        with mock.patch('datingapp.imaging.generate_variants') as generate:
+            imaging.process('accounts.UserProfile', profile.pk, 'profile_image', source)
+        generate.assert_not_called()
+        profile.refresh_from_db()
+        self.assertEqual(profile.image_variants, current)
+        self.assertTrue(all(self.storage.exists(name) for name in variant_names(current)))
+
+
+class MediaServingTests(TempMediaMixin, TestCase):
+    body = b'0123456789abcdef'
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.storage.path('docs'))
+        with open(self.storage.path('docs/a.txt'), 'wb') as handle:
+            handle.write(self.body)
+
+    def fetch(self, method='get', path='/media/docs/a.txt', **headers):
+        response = getattr(self.client, method)(path, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_whole_file(self):
+        response, content = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_byte_ranges(self):
+        response, content = self.fetch(HTTP_RANGE='bytes=2-5')
+        self.assertEqual((response.status_code, content), (206, b'2345'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/16')
+        self.assertEqual(response['Content-Length'], '4')
+        response, content = self.fetch(HTTP_RANGE='bytes=-3')
+        self.assertEqual((response.status_code, content), (206, b'def'))
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.fetch(HTTP_RANGE='bytes=16-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */16')
+
+    def test_conditional_requests(self):
+        first, _ = self.fetch()
+        response, content = self.fetch(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, content), (304, b''))
+        self.assertEqual(response['Cache-Control'], first['Cache-Control'])
+        response, _ = self.fetch(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range_mismatch_sends_the_whole_file(self):
+        etag = self.fetch()[0]['ETag']
+        response, content = self.fetch(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, content), (200, self.body))
+        response, content = self.fetch(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, content), (206, b'2345'))
+
+    def test_head(self):
+        response, content = self.fetch('head')
+        self.assertEqual((response.status_code, content), (200, b''))
+        self.assertEqual(response['Content-Length'], '16')
+        response, content = self.fetch('head', HTTP_RANGE='bytes=0-3')
+        self.assertEqual((response.status_code, content), (206, b''))
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_blobs_are_immutable(self):
+        name = self.storage.save('me.png', ContentFile(b'blob'))
+        response, content = self.fetch(path=f'/media/{name}')
+        self.assertEqual(content, b'blob')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], '"%s"' % os.path.splitext(os.path.basename(name))[0])
+
+    def test_sendfile_headers(self):
+        with override_settings(MEDIA_SERVING={**settings.MEDIA_SERVING, 'SENDFILE': 'x-accel-redirect'}):
+            response, content = self.fetch()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/docs/a.txt')
+        self.assertEqual(content, b'')
+        with override_settings(MEDIA_SERVING={**settings.MEDIA_SERVING, 'SENDFILE': 'x-sendfile'}):
+            response, content = self.fetch()
+        self.assertEqual(response['X-Sendfile'], self.storage.path('docs/a.txt'))
+        self.assertEqual(content, b'')
+
+
+class UserProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Users.objects.create_superuser('admin@example.com', 'admin', 'pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def provision(self, rows):
+        response = self.client.post('/api/accounts/users/bulk/', rows, format='json')
+        return response, [result['status'] for result in response.data['results']]
+
+    def test_invalid_email_is_rejected(self):
+        response, statuses = self.provision([
+            {'email': 'not-an-address', 'username': 'bad', 'password': 'secret'},
+            {'email': 'good@example.com', 'username': 'good', 'password': 'secret'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(statuses, ['error', 'created'])
+        self.assertIn('email', response.data['results'][0]['errors'][0])
+        self.assertFalse(Users.objects.filter(username='bad').exists())
+
+    def test_clash_after_lookup_fails_only_that_row(self):
+        load_lookups = Provisioner.load_lookups
+
+        def racing_load_lookups(provisioner, rows):
+            load_lookups(provisioner, rows)
+            Users.objects.create_user('taken@example.com', 'someone', 'pw')
+
+        rows = [
+            {'email': 'first@example.com', 'username': 'first', 'password': 'secret'},
+            {'email': 'taken@example.com', 'username': 'second', 'password': 'secret'},
+            {'email': 'third@example.com', 'username': 'third', 'password': 'secret'},
+        ]
+        with mock.patch.object(Provisioner, 'load_lookups', racing_load_lookups):
+            response, statuses = self.provision(rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(statuses, ['created', 'error', 'created'])
+        self.assertEqual(response.data['failed'], 1)
+        self.assertFalse(Users.objects.filter(username='second').exists())
+
+    def test_idempotency_key_fingerprints_file_contents(self):
+        caches[settings.IDEMPOTENCY_CACHE].clear()
+
+        def upload(content):
+            handle = SimpleUploadedFile('class.csv', content.encode(), content_type='text/csv')
+            return self.client.post(
+                '/api/accounts/users/bulk/', {'file': handle}, format='multipart', HTTP_IDEMPOTENCY_KEY='class-7b',
+            )
+
+        first = 'email,username,password\nada@example.com,ada,secret\n'
+        self.assertEqual(upload(first).status_code, 201)
+        # Same file name, different rows: not a retry of the first upload
+        self.assertEqual(upload('email,username,password\nbob@example.com,bob,secret\n').status_code, 422)
+        retry = upload(first)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Users.objects.filter(username__in=['ada', 'bob']).count(), 1)
+
+
+class ConditionalProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_missing_profile_is_not_tagged(self):
+        response = self.client.get('/api/accounts/profile/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_not_modified_keeps_cache_headers(self):
+        UserProfile.objects.create(user=self.user)
+        first = self.client.get('/api/accounts/profile/')
+        self.assertEqual(first.status_code, 200)
+
+        second = self.client.get('/api/accounts/profile/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Cache-Control'], first['Cache-Control'])
+        self.assertEqual(second['Vary'], first['Vary'])
+
+
+class BlacklistFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+
+    def setUp(self):
+        # A fresh process-wide filter for each test
+        patcher = mock.patch.object(blacklist, '_filter', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def outstanding(self):
+        token = RefreshToken.for_user(self.user)
+        return token, OutstandingToken.objects.get(jti=token['jti'])
+
+    def blacklist_elsewhere(self, pk, outstanding):
+        # bulk_create sends no post_save: a row written by another process
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(id=pk, token=outstanding)])
+
+    def test_rows_from_other_processes_are_synced(self):
+        jti_filter = blacklist.BlacklistFilter(1000, 0.001, sync_interval=0)
+        token, outstanding = self.outstanding()
+        self.assertFalse(jti_filter.might_contain(token['jti']))
+        self.blacklist_elsewhere(1, outstanding)
+        self.assertTrue(jti_filter.might_contain(token['jti']))
+
+    def test_row_committed_out_of_id_order_is_found(self):
+        jti_filter = blacklist.BlacklistFilter(1000, 0.001, sync_interval=0)
+        (first, first_row), (second, second_row) = self.outstanding(), self.outstanding()
+        # id 11 commits and is synced before id 10
+        self.blacklist_elsewhere(11, second_row)
+        self.assertTrue(jti_filter.might_contain(second['jti']))
+        self.blacklist_elsewhere(10, first_row)
+        self.assertTrue(jti_filter.might_contain(first['jti']))
+
+    def test_gaps_are_given_up_after_the_overlap(self):
+        jti_filter = blacklist.BlacklistFilter(1000, 0.001, sync_interval=0, overlap=0)
+        token, outstanding = self.outstanding()
+        self.blacklist_elsewhere(11, outstanding)
+        jti_filter.might_contain(token['jti'])
+        self.assertEqual(jti_filter._gaps, {})
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={'ENABLED': True, 'SYNC_INTERVAL': 3600})
+    def test_blacklist_in_this_process_is_seen_before_the_next_sync(self):
+        token, _ = self.outstanding()
+        jti_filter = blacklist.get_blacklist_filter()
+        self.assertFalse(jti_filter.might_contain(token['jti']))
+        token.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(jti_filter.might_contain(token['jti']))
+        with self.assertRaises(TokenError):
+            blacklist.FilteredRefreshToken(str(token))
+
+
+class LoginTests(TransactionTestCase):
+    # Passwords are checked on the pool's own threads and connections, which
+    # only see committed rows
+
+    def setUp(self):
+        self.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+        # One worker, no queue and no wait: holding the only slot saturates the pool
+        self.pool = password_pool.PasswordCheckPool(workers=1, max_pending=0, wait=0)
+        patcher = mock.patch.object(password_pool, '_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.pool._executor.shutdown)
+
+    def login(self, url='/api/accounts/login/', password='pw'):
+        with self.assertLogs('accounts.auth') as logs:
+            response = self.client.post(
+                url, {'email': 'student@example.com', 'password': password}, content_type='application/json'
+            )
+        response.events = [record.event for record in logs.records]
+        return response
+
+    def test_login_sets_cookies(self):
+        for url in ('/api/accounts/login/', '/api/accounts/login/async/'):
+            with self.subTest(url=url):
+                response = self.login(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('access_token', response.cookies)
+                self.assertIn('refresh_token', response.cookies)
+
+    def test_saturated_pool_sheds_logins(self):
+        self.pool._slots.acquire()
+        self.addCleanup(self.pool._slots.release)
+        for url in ('/api/accounts/login/', '/api/accounts/login/async/'):
+            with self.subTest(url=url):
+                response = self.login(url)
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response['Retry-After'], '1')
+                self.assertEqual(response.events, ['login_busy'])
+                self.assertNotIn('access_token', response.cookies)
+
+    def test_pbkdf2_password_is_rehashed_on_login(self):
+        self.user.password = make_password('pw', hasher='pbkdf2_sha256')
+        self.user.save(update_fields=['password'])
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_argon2_parameters_change_is_applied_on_login(self):
+        with override_settings(ARGON2_PARAMETERS={**settings.ARGON2_PARAMETERS, 'TIME_COST': 3}):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn(',t=3,', self.user.password)
+
+
+class TokenCompactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+        now = timezone.now()
+        # Five expired tokens (two blacklisted) issued before two live ones (one blacklisted)
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                user=user, jti=f'jti-{number}', token=f'token-{number}', created_at=now,
+                expires_at=now + datetime.timedelta(days=-1 if number < 5 else 1),
+            )
+            for number in range(7)
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=tokens[number]) for number in (0, 3, 6)])
+
+    def test_only_expired_tokens_are_deleted(self):
+        report = compaction.compact_tokens(batch_size=2)
+        self.assertEqual(
+            (report.outstanding, report.blacklisted, report.batches, report.complete), (5, 2, 3, True)
+        )
+        self.assertEqual(sorted(OutstandingToken.objects.values_list('jti', flat=True)), ['jti-5', 'jti-6'])
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['jti-6'])
+
+    def test_time_budget_stops_after_the_current_batch(self):
+        report = compaction.compact_tokens(batch_size=2, time_budget=0)
+        self.assertEqual((report.outstanding, report.batches, report.complete), (2, 1, False))
+        # Oldest first, so the next run picks up where this one stopped
+        self.assertFalse(OutstandingToken.objects.filter(jti__in=['jti-0', 'jti-1']).exists())
+        self.assertEqual(OutstandingToken.objects.count(), 5)
+
+    def test_command_runs_every_interval(self):
+        command = 'accounts.management.commands.compact_tokens'
+        stdout = io.StringIO()
+        with mock.patch(f'{command}.close_old_connections'), \
+                mock.patch(f'{command}.time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('compact_tokens', '--interval', '60', '--pause', '0', stdout=stdout)
+        sleep.assert_called_with(60)
+        self.assertEqual(stdout.getvalue().count('Reclaimed'), 2)
+        self.assertIn('Reclaimed 5 outstanding and 2 blacklisted tokens', stdout.getvalue())
+
+
+@override_settings(AUTH_USER_CACHE={'ENABLED': True}, AUTH_TOKEN_CACHE={'ENABLED': True})
+class AuthCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user('student@example.com', 'student', 'pw', Role='user')
+
+    def setUp(self):
+        # Fresh per-process caches for each test
+        patcher = mock.patch.dict(authentication._caches, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.raw_token = str(AccessToken.for_user(self.user))
+        self.client.cookies['access_token'] = self.raw_token
+
+    def whoami(self):
+        return self.client.get('/api/accounts/user/')
+
+    def cached_token(self):
+        return authentication.get_token_cache().get(authentication._token_key(self.raw_token))
+
+    def test_repeat_requests_are_served_from_the_caches(self):
+        self.whoami()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.whoami().data['username'], 'student')
+
+        admin = APIClient()
+        admin.force_authenticate(Users.objects.create_superuser('admin@example.com', 'admin', 'pw'))
+        stats = admin.get('/api/accounts/auth/cache-stats/').data
+        self.assertEqual((stats['users']['hits'], stats['users']['misses']), (1, 1))
+        self.assertEqual(stats['users']['hit_rate'], 0.5)
+        self.assertEqual((stats['tokens']['hits'], stats['tokens']['misses']), (1, 1))
+        self.assertEqual(stats['tokens']['hit_rate'], 0.5)
+
+    def test_saving_a_user_evicts_them_and_their_tokens(self):
+        self.whoami()
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIsNone(authentication.get_user_cache().get(str(self.user.pk)))
+        self.assertIsNone(self.cached_token())
+        self.assertEqual(self.whoami().data['username'], 'renamed')
+
+    def test_deactivated_user_is_rejected(self):
+        self.whoami()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.whoami().status_code, 401)
+
+    def test_logout_forgets_the_verified_token(self):
+        self.whoami()
+        self.assertIsNotNone(self.cached_token())
+        self.assertEqual(self.client.post('/api/accounts/logout/').status_code, 205)
+        self.assertIsNone(self.cached_token())
+
+    def test_blacklisted_token_is_rejected_on_a_cache_hit(self):
+        token = SlidingToken.for_user(self.user)
+        self.raw_token = str(token)
+        self.client.cookies['access_token'] = self.raw_token
+        # Access tokens cannot be blacklisted; sliding ones can and take the check_blacklist() path
+        with mock.patch.object(jwt_authentication.api_settings, 'AUTH_TOKEN_CLASSES', (AccessToken, SlidingToken)):
+            self.assertEqual(self.whoami().status_code, 200)
+            self.assertIsNotNone(self.cached_token())
+            token.blacklist()
+            self.assertEqual(self.whoami().status_code, 401)
+        self.assertIsNone(self.cached_token())
@@ -0,0 +1,202 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import ImageUpload, UserProfile
+
+READ_BLOCK = 64 * 1024
+
+# Leading bytes of the image formats accepted for profile pictures
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+SNIFF_BYTES = 12
+
+
+class UploadError(Exception):
+    """Rejected upload; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _config():
+    return settings.CHUNKED_UPLOADS
+
+
+def sniff(header):
+    """Content type from the first bytes of a file, or None if not an accepted image."""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def temp_path(upload):
+    return os.path.join(_config()['DIR'], f'{upload.pk}.part')
+
+
+def _stale_after():
+    return _config().get('STALE_AFTER', 15)
+
+
+def recover(upload):
+    """
+    ``upload`` with its offset pulled back to the bytes on disk if the
+    chunk that claimed it died without giving the claim back (a worker
+    killed mid-chunk). Claims whose writer touched them within
+    ``CHUNKED_UPLOADS['STALE_AFTER']`` seconds are left alone.
+    """
+    if upload.updated_at > timezone.now() - timedelta(seconds=_stale_after()):
+        return upload
+    try:
+        on_disk = os.path.getsize(temp_path(upload))
+    except FileNotFoundError:
+        return upload
+    if on_disk < upload.offset:
+        # Conditional on the stale claim, so a writer that wakes up meanwhile keeps it
+        if ImageUpload.objects.filter(pk=upload.pk, offset=upload.offset, updated_at=upload.updated_at).update(
+            offset=on_disk, updated_at=timezone.now()
+        ):
+            upload.offset = on_disk
+    return upload
+
+
+def start(user, filename, size):
+    """Register a new upload after checking what can be checked before any bytes arrive."""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension not in _config()['EXTENSIONS']:
+        raise UploadError(f"Unsupported file type, use one of: {', '.join(_config()['EXTENSIONS'])}.")
+    if size <= 0 or size > _config()['MAX_SIZE']:
+        raise UploadError(f"size must be between 1 and {_config()['MAX_SIZE']} bytes.", status=413)
+
+    purge_expired()
+    upload = ImageUpload.objects.create(user=user, filename=os.path.basename(filename), size=size)
+    os.makedirs(_config()['DIR'], exist_ok=True)
+    open(temp_path(upload), 'wb').close()
+    return upload
+
+
+def _read(stream, size):
+    """Up to ``size`` bytes from ``stream``; fewer only if the client went away."""
+    data = b''
+    while len(data) < size:
+        try:
+            block = stream.read(min(READ_BLOCK, size - len(data)))
+        except OSError:  # client went away (UnreadablePostError)
+            break
+        if not block:
+            break
+        data += block
+    return data
+
+
+def append(upload, offset, stream, length):
+    """
+    Copy a chunk of ``length`` bytes (the Content-Length) from ``stream``
+    to the temp file at ``offset``.
+
+    The byte range is claimed before anything is read or written: one
+    conditional UPDATE moves the offset to the end of the chunk, so of two
+    requests racing for the same offset only one writes and the other gets
+    a 409. A chunk carrying the start of the file is checked against the
+    image signatures before its bytes reach the disk (415). The rest goes to
+    disk ``READ_BLOCK`` bytes at a time and is never held in memory. If
+    the client disconnects mid-chunk, the offset moves back to what
+    arrived, which is where it resumes. While writing, the claim is
+    touched every third of ``STALE_AFTER`` so :func:`recover` leaves it
+    alone; a writer that finds its claim recovered stops (409) before
+    writing again. Returns the upload with its new offset; also raises
+    UploadError on an oversized chunk (413).
+    """
+    if offset != upload.offset:
+        raise UploadError(f"Upload-Offset {offset} does not match the server offset {upload.offset}.", status=409)
+    if length > upload.size - offset:
+        raise UploadError("Chunk runs past the announced size.", status=413)
+
+    end = offset + length
+    claimed = ImageUpload.objects.filter(pk=upload.pk, offset=offset).update(offset=end, updated_at=timezone.now())
+    if not claimed:
+        raise UploadError("Concurrent upload to the same offset.", status=409)
+
+    head = b''
+    header_size = min(SNIFF_BYTES, upload.size)
+    if not upload.content_type and offset < header_size:
+        head = _read(stream, min(header_size - offset, length))
+        with open(temp_path(upload), 'rb') as handle:
+            header = handle.read(offset) + head
+        if len(header) >= header_size:
+            content_type = sniff(header)
+            if content_type is None:
+                discard(upload)
+                raise UploadError("File is not a JPEG, PNG, GIF or WebP image.", status=415)
+            upload.content_type = content_type
+            ImageUpload.objects.filter(pk=upload.pk).update(content_type=content_type)
+
+    written = len(head)
+    touched = time.monotonic()
+    with open(temp_path(upload), 'r+b') as handle:
+        handle.seek(offset)
+        handle.write(head)
+        while written < length:
+            block = _read(stream, min(READ_BLOCK, length - written))
+            if not block:
+                break
+            if time.monotonic() - touched > _stale_after() / 3:
+                handle.flush()
+                if not ImageUpload.objects.filter(pk=upload.pk, offset=end).update(updated_at=timezone.now()):
+                    raise UploadError("The upload was resumed by another request.", status=409)
+                touched = time.monotonic()
+            handle.write(block)
+            written += len(block)
+        handle.truncate()
+
+    if written < length:
+        ImageUpload.objects.filter(pk=upload.pk, offset=end).update(offset=offset + written)
+    upload.offset = offset + written
+    return upload
+
+
+def finish(upload):
+    """Verify the complete file and attach it to the user's profile in one save."""
+    path = temp_path(upload)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        discard(upload)
+        raise UploadError("File is not a valid image.", status=415)
+
+    with transaction.atomic():
+        profile, _ = UserProfile.objects.get_or_create(user_id=upload.user_id)
+        with open(path, 'rb') as handle:
+            profile.profile_image.save(upload.filename, File(handle), save=True)
+        upload.delete()
+    os.remove(path)
+    return profile
+
+
+def discard(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def purge_expired():
+    """Drop uploads nobody touched within ``CHUNKED_UPLOADS['EXPIRE_AFTER']`` seconds."""
+    for upload in ImageUpload.objects.expired():
+        discard(upload)
@@ -1,17 +1,25 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .middleware import refresh_cookie_to_body
 from .views import (
     # 🔐 Auth & User
     RegisterView,
     CookieTokenObtainPairView,
+    async_login,
     RefreshFromCookie,
     LogoutView,
     UserDetail,
+    AuthCacheStatsView,
     UserUpdateView,
     UserProfileView,
+    ProfileImageUploadView,
+    ProfileImageUploadChunkView,
+    UserBulkProvisionView,
     SubjectListView,
     TeacherSubjectListView,
     AttendanceView,
+    AttendanceSummaryView,
+    AttendanceExportView,
     # 📚 Section API
     SectionListView,
 
@@ -27,13 +35,19 @@ urlpatterns = [
     # 🔐 Auth
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CookieTokenObtainPairView.as_view(), name='login'),
-    path('refresh/', RefreshFromCookie.as_view(), name='token_refresh'),
+    path('login/async/', async_login, name='login-async'),
+    path('refresh/', refresh_cookie_to_body(RefreshFromCookie.as_view()), name='token_refresh'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('auth/cache-stats/', AuthCacheStatsView.as_view(), name='auth-cache-stats'),
 
     # 👤 User
     path('user/', UserDetail.as_view(), name='user-detail'),
     path('profile/update/', UserUpdateView.as_view(), name='profile-update'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
+    path('profile/image/uploads/', ProfileImageUploadView.as_view(), name='profile-image-upload'),
+    path('profile/image/uploads/<uuid:upload_id>/', ProfileImageUploadChunkView.as_view(),
+         name='profile-image-upload-chunk'),
+    path('users/bulk/', UserBulkProvisionView.as_view(), name='users-bulk'),
 
     # 📚 Section & Subject
     path('subjects/', SubjectListView.as_view(), name='subject-list'),
@@ -41,5 +55,7 @@ urlpatterns = [
     path('teacher-subjects/', TeacherSubjectListView.as_view(), name='teacher-subjects-list'),
     # 📘 StudentSubject API
     path('attendance/', AttendanceView.as_view(), name='attendance'),
+    path('attendance/export/', AttendanceExportView.as_view(), name='attendance-export'),
+    path('attendance/summary/', AttendanceSummaryView.as_view(), name='attendance-summary'),
     path('', include(router.urls)),  # Include ViewSet routes
 ]
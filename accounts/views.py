@@ -1,24 +1,49 @@
+import json
+import logging
+import time
 from datetime import timedelta
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from .blacklist import FilteredRefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.exceptions import InvalidToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import JWTAuthenticationFromCookie as CookieJWTAuthentication
+from .authentication import auth_cache_stats, forget_verified_token
 from django.contrib.auth import get_user_model
-from django.utils.timezone import now
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
 
 from .serializer import RegistrationSerializer, CustomUserSerializer,UserUpdateSerializer
+from .idempotency import idempotent
+from datingapp.conditional import conditional, digest_etag, request_etag
+from .password_pool import LoginBusy, get_password_pool
 
 User = get_user_model()
+logger = logging.getLogger('accounts.auth')
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def set_auth_cookies(response, access_token=None, refresh_token=None):
+    if access_token:
+        response.set_cookie('access_token', str(access_token), httponly=True, secure=True, samesite='None', max_age=300, path='/')
+    if refresh_token:
+        response.set_cookie('refresh_token', str(refresh_token), httponly=True, secure=True, samesite='None', max_age=7 * 24 * 3600, path='/')
 
 
 # ----------------------------
 # Custom Authentication Class
 # ----------------------------
-class JWTAuthenticationFromCookie(JWTAuthentication):
+class JWTAuthenticationFromCookie(CookieJWTAuthentication):
     def authenticate(self, request):
         token = request.COOKIES.get('access_token')
         if not token:
@@ -37,7 +62,9 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = RegistrationSerializer
 
+    @idempotent(per_user=False)
     def create(self, request, *args, **kwargs):
+        started = time.perf_counter()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
@@ -47,10 +74,8 @@ class RegisterView(generics.CreateAPIView):
         user_data = CustomUserSerializer(user).data
 
         response = Response({"user": user_data}, status=status.HTTP_201_CREATED)
-        response.set_cookie('access_token', access_token, httponly=True, secure=True, samesite='None', max_age=300, path='/')
-        response.set_cookie('refresh_token', str(refresh), httponly=True, secure=True, samesite='None', max_age=7 * 24 * 3600, path='/')
-        print("✅ [REGISTER] Access Token:", access_token[:30] + "...")
-        print("✅ [REGISTER] Refresh Token:", str(refresh)[:30] + "...")
+        set_auth_cookies(response, access_token, refresh)
+        logger.info("register", extra={'event': 'register', 'user_id': user.pk, 'latency_ms': elapsed_ms(started)})
         return response
 
 
@@ -61,18 +86,65 @@ class CookieTokenObtainPairView(TokenObtainPairView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        access_token = response.data.pop('access', None)
-        refresh_token = response.data.pop('refresh', None)
+        started = time.perf_counter()
+        serializer = self.get_serializer(data=request.data)
+        try:
+            # Password hashing runs on the bounded pool; raises LoginBusy (429) when saturated
+            get_password_pool().run(serializer.is_valid, raise_exception=True)
+        except LoginBusy:
+            logger.warning("login shed", extra={'event': 'login_busy', 'latency_ms': elapsed_ms(started)})
+            raise
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        except Exception:
+            logger.info("login failed", extra={'event': 'login_failed', 'latency_ms': elapsed_ms(started)})
+            raise
+
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        set_auth_cookies(response, response.data.pop('access', None), response.data.pop('refresh', None))
+
+        logger.info("login", extra={'event': 'login', 'user_id': serializer.user.pk, 'latency_ms': elapsed_ms(started)})
+        return response
 
-        if access_token:
-            response.set_cookie('access_token', access_token, httponly=True, secure=True, samesite='None', max_age=300, path='/')
-            print("✅ [LOGIN] Access Token:", access_token[:30] + "...")
-        if refresh_token:
-            response.set_cookie('refresh_token', refresh_token, httponly=True, secure=True, samesite='None', max_age=7 * 24 * 3600, path='/')
-            print("✅ [LOGIN] Refresh Token:", refresh_token[:30] + "...")
 
+# ----------------------
+# Async Login View (ASGI)
+# ----------------------
+@csrf_exempt
+async def async_login(request):
+    """
+    Login for ASGI workers: the event loop awaits the password check on the
+    bounded pool instead of parking a worker thread on it. Same request and
+    cookies as CookieTokenObtainPairView; sheds load with 429 immediately
+    when the pool is full.
+    """
+    started = time.perf_counter()
+    if request.method != 'POST':
+        return JsonResponse({'detail': 'Method not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid JSON body.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = import_string(api_settings.TOKEN_OBTAIN_SERIALIZER)(data=data)
+    try:
+        valid = await get_password_pool().arun(serializer.is_valid)
+    except LoginBusy as e:
+        logger.warning("login shed", extra={'event': 'login_busy', 'latency_ms': elapsed_ms(started)})
+        response = JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        response['Retry-After'] = str(e.wait)
         return response
+    except AuthenticationFailed as e:
+        logger.info("login failed", extra={'event': 'login_failed', 'latency_ms': elapsed_ms(started)})
+        return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+    if not valid:
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    tokens = dict(serializer.validated_data)
+    response = JsonResponse({}, status=status.HTTP_200_OK)
+    set_auth_cookies(response, tokens.pop('access', None), tokens.pop('refresh', None))
+    logger.info("login", extra={'event': 'login', 'user_id': serializer.user.pk, 'latency_ms': elapsed_ms(started)})
+    return response
 
 
 # ----------------------
@@ -82,32 +154,24 @@ class RefreshFromCookie(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        print("📥 [REFRESH] POST /accounts/refresh/ called")
-
+        started = time.perf_counter()
         refresh_token = request.COOKIES.get('refresh_token')
         if not refresh_token:
-            print("❌ [REFRESH] No refresh token found in cookie.")
+            logger.info("refresh without cookie", extra={'event': 'refresh_missing', 'latency_ms': elapsed_ms(started)})
             return Response({'detail': 'No refresh token'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            token_obj = RefreshToken(refresh_token)
+            token_obj = FilteredRefreshToken(refresh_token)
             new_access = str(token_obj.access_token)
-            print("🔁 [REFRESH] New access token:", new_access[:30] + "...")
-        except InvalidToken:
-            print("❌ [REFRESH] Invalid refresh token.")
+        except (InvalidToken, TokenError):
+            logger.info("refresh rejected", extra={'event': 'refresh_invalid', 'latency_ms': elapsed_ms(started)})
             return Response({'detail': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
 
         response = Response({'access': new_access}, status=status.HTTP_200_OK)
-        response.set_cookie(
-            'access_token',
-            new_access,
-            httponly=True,
-            secure=True,  # Set to True in production
-            samesite='None',
-            max_age=300,
-            path='/'
-        )
-        print("✅ [REFRESH] Token refreshed at", now())
+        set_auth_cookies(response, new_access)
+        logger.info("refresh", extra={
+            'event': 'refresh', 'user_id': token_obj.get(api_settings.USER_ID_CLAIM), 'latency_ms': elapsed_ms(started),
+        })
         return response
 
 
@@ -119,19 +183,26 @@ class LogoutView(APIView):
     authentication_classes = [JWTAuthenticationFromCookie]
 
     def post(self, request):
+        started = time.perf_counter()
+        blacklisted = False
         refresh_token = request.COOKIES.get('refresh_token')
         if refresh_token:
             try:
-                token = RefreshToken(refresh_token)
+                token = FilteredRefreshToken(refresh_token)
                 token.blacklist()
-                print("🗑️ [LOGOUT] Refresh token blacklisted.")
-            except Exception as e:
-                print("⚠️ [LOGOUT] Error blacklisting token:", e)
+                blacklisted = True
+            except Exception:
+                logger.warning("could not blacklist refresh token", exc_info=True,
+                               extra={'event': 'logout_blacklist_failed', 'user_id': request.user.pk})
+
+        forget_verified_token(request.COOKIES.get('access_token'))
 
         response = Response({"detail": "Logged out successfully"}, status=status.HTTP_205_RESET_CONTENT)
         response.delete_cookie('access_token', path='/')
         response.delete_cookie('refresh_token', path='/')
-        print("✅ [LOGOUT] Cookies cleared.")
+        logger.info("logout", extra={
+            'event': 'logout', 'user_id': request.user.pk, 'blacklisted': blacklisted, 'latency_ms': elapsed_ms(started),
+        })
         return response
 
 
@@ -143,9 +214,10 @@ class UserDetail(APIView):
     authentication_classes = [JWTAuthenticationFromCookie]
 
     def get(self, request):
+        started = time.perf_counter()
         user = request.user
         serializer = CustomUserSerializer(user)
-        print(f"👤 [USER] Fetched user: {user.email}")
+        logger.debug("user detail", extra={'event': 'user_detail', 'user_id': user.pk, 'latency_ms': elapsed_ms(started)})
         return Response(serializer.data)
 # views.py
 
@@ -180,9 +252,23 @@ from accounts.models import UserProfile
 from accounts.serializer import UserProfileSerializer
 from rest_framework import status, permissions
 
+def profile_last_modified(request):
+    # Looked up once per request, both validators need it
+    if not hasattr(request, '_profile_updated_at'):
+        request._profile_updated_at = (
+            UserProfile.objects.filter(user_id=request.user.pk).values_list('updated_at', flat=True).first()
+        )
+    return request._profile_updated_at
+
+
+def profile_etag(request):
+    return request_etag(request, request.user.pk, profile_last_modified(request))
+
+
 class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional(etag=profile_etag, last_modified=profile_last_modified)
     def get(self, request):
         try:
             profile = request.user.profile  # OneToOneField related_name='profile'
@@ -192,6 +278,7 @@ class UserProfileView(APIView):
         serializer = UserProfileSerializer(profile, context={'request': request})
         return Response(serializer.data)
 
+    @idempotent
     def post(self, request):
         # Create profile if doesn't exist
         try:
@@ -218,6 +305,100 @@ class UserProfileView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+from django.urls import reverse
+from . import uploads
+from .models import ImageUpload
+
+class ProfileImageUploadView(APIView):
+    """
+    Start a resumable profile image upload: POST {"filename", "size"}.
+
+    Then send the bytes with PATCH to the returned URL as a raw body
+    (Content-Type: application/offset+octet-stream) with Upload-Offset and
+    Content-Length headers. Chunks of any size go straight to disk. After a dropped
+    connection, GET the upload to learn the offset to resume from. The
+    chunk that completes the file attaches it to the profile.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        filename = str(request.data.get('filename') or '')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({"error": "size (total bytes) is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = uploads.start(request.user, filename, size)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=e.status)
+        response = Response(self.describe(request, upload), status=status.HTTP_201_CREATED)
+        response['Location'] = response.data['url']
+        return response
+
+    @staticmethod
+    def describe(request, upload):
+        return {
+            'id': upload.pk,
+            'url': request.build_absolute_uri(reverse('profile-image-upload-chunk', args=[upload.pk])),
+            'filename': upload.filename,
+            'size': upload.size,
+            'offset': upload.offset,
+        }
+
+
+class ProfileImageUploadChunkView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_upload(self, request, upload_id):
+        try:
+            return ImageUpload.objects.get(pk=upload_id, user=request.user)
+        except ImageUpload.DoesNotExist:
+            return None
+
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        upload = uploads.recover(upload)
+        response = Response(ProfileImageUploadView.describe(request, upload))
+        response['Upload-Offset'] = upload.offset
+        return response
+
+    def patch(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"error": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or '')
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "Content-Length header is required."}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        try:
+            # Read the raw body ourselves; touching request.data would buffer it through a parser
+            upload = uploads.append(uploads.recover(upload), offset, request._request, length)
+            if upload.offset < upload.size:
+                response = Response(ProfileImageUploadView.describe(request, upload))
+                response['Upload-Offset'] = upload.offset
+                return response
+            profile = uploads.finish(upload)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=e.status)
+        return Response(UserProfileSerializer(profile, context={'request': request}).data)
+
+    def delete(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        uploads.discard(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 # views.py
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -228,6 +409,7 @@ from .serializer import SectionSerializer
 class SectionListView(APIView):
     permission_classes = [permissions.IsAuthenticated]  # require auth, adjust as needed
 
+    @conditional(etag=digest_etag(lambda request: Section.objects.all(), 'id', 'name'))
     def get(self, request):
         sections = Section.objects.all()
         serializer = SectionSerializer(sections, many=True)
@@ -242,6 +424,7 @@ from .serializer import SubjectSerializer
 class SubjectListView(APIView):
     permission_classes = [IsAuthenticated]  # Remove this line if you want public access
 
+    @conditional(etag=digest_etag(lambda request: Subject.objects.all(), 'id', 'subject_name'))
     def get(self, request):
         subjects = Subject.objects.all()
         serializer = SubjectSerializer(subjects, many=True)
@@ -264,6 +447,14 @@ class TeacherSubjectListView(generics.ListAPIView):
     queryset = TeacherSubject.objects.select_related('subject', 'section', 'teacher').all()
     serializer_class = TeacherSubjectSerializer
     permission_classes = [permissions.IsAuthenticated]  # Optional: allow only logged-in users
+
+    @conditional(etag=digest_etag(
+        lambda request: TeacherSubject.objects.all(),
+        'id', 'subject_id', 'subject__subject_name', 'section_id', 'section__name',
+        'teacher_id', 'teacher__username', 'subject_time',
+    ))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
@@ -282,31 +473,153 @@ class TeacherOnlyMixin:
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from .models import Attendance, TeacherSubject, Section
-from .serializer import AttendanceSerializer
+from .serializer import AttendanceSerializer, AttendanceBulkSerializer, AttendanceFilterSerializer
 from django.contrib.auth import get_user_model
+from datingapp.pagination import KeysetPagination
 
 User = get_user_model()
 
+class AttendancePagination(KeysetPagination):
+    ordering = ('-date', '-id')
+    page_size = 100
+    max_page_size = 1000
+
 class AttendanceView(generics.GenericAPIView):
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AttendancePagination
 
     def get(self, request):
         user = request.user
+        filters = AttendanceFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+
         # List attendance records for sections/subjects assigned to this teacher
-        queryset = Attendance.objects.filter(
-            section__teachersubject__teacher=user
-        ).distinct()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        sections = filters.get_model().objects.for_teacher_by_section(user, filters.validated_data.get('section'))
+        querysets = [filters.filter_queryset(queryset) for queryset in sections]
 
+        page = self.paginator.paginate_querysets(querysets, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @idempotent
     def post(self, request):
         user = request.user
         data = request.data
         if not isinstance(data, list):
             return Response({"error": "Expected a list of attendance records."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(data=data, many=True, context={'request': request})
+        serializer = AttendanceBulkSerializer(data=data, context=self.get_serializer_context())
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response({"success": "Attendance recorded successfully."}, status=status.HTTP_201_CREATED)
+
+
+from django.db.models import Sum
+from .models import AttendanceSummary
+from .serializer import AttendanceSummaryFilterSerializer, AttendanceSummarySerializer
+
+class AttendanceSummaryView(APIView):
+    """Present/absent counts per student and TeacherSubject, read from the rollup table."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        filters = AttendanceSummaryFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        queryset = AttendanceSummary.objects.all()
+        if user.Role == 'teacher':
+            queryset = queryset.filter(subject__teacher=user)
+        elif not (user.Role == 'admin' or user.is_staff):
+            queryset = queryset.filter(student=user)
+        if 'student' in params:
+            queryset = queryset.filter(student_id=params['student'])
+        if 'subject' in params:
+            queryset = queryset.filter(subject_id=params['subject'])
+
+        group_by = ['student', 'subject']
+        if params['by'] == 'month':
+            group_by.append('month')
+        rows = (
+            queryset.values(*group_by)
+            .annotate(present=Sum('present'), absent=Sum('absent'))
+            .order_by(*group_by)
+        )
+        return Response(AttendanceSummarySerializer(rows, many=True).data)
+
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .export import EXPORT_FORMATS, export_rows
+
+class AttendanceExportView(APIView):
+    """Streams attendance as CSV (default) or NDJSON: ?file_format=ndjson."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"error": f"Unsupported file_format, use one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        filters = AttendanceFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+
+        stream, content_type = EXPORT_FORMATS[file_format]
+        rows = export_rows(filters.filter_queryset(filters.get_model().objects.all()))
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        filename = f"attendance-{timezone.now():%Y%m%d-%H%M%S}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from .provisioning import provision_users, read_upload
+
+class UserBulkProvisionView(APIView):
+    """
+    Create a whole class of accounts at once.
+
+    Accepts a JSON list of users or a multipart ``file`` (.csv or .json);
+    see accounts.provisioning for the columns. Responds with a report of
+    every row: created rows carry the new id, rejected rows their errors.
+    Passwords are hashed one after another; large imports are faster
+    through the provision_users command.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    @idempotent
+    def post(self, request):
+        started = time.perf_counter()
+        if 'file' in request.FILES:
+            try:
+                rows = read_upload(request.FILES['file'])
+            except (ValueError, UnicodeDecodeError) as e:
+                return Response({"error": f"Unreadable file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({"error": "Send a JSON list of users or upload a file."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Hashed in this worker: a process pool belongs to the provision_users command, not a request
+        results = provision_users(rows, workers=1)
+        created = sum(1 for result in results if result['status'] == 'created')
+        logger.info("bulk provision", extra={
+            'event': 'bulk_provision', 'user_id': request.user.pk, 'users_created': created,
+            'users_failed': len(results) - created, 'latency_ms': elapsed_ms(started),
+        })
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class AuthCacheStatsView(APIView):
+    """Size and hit rate of this worker's authentication caches."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(auth_cache_stats())
@@ -0,0 +1,112 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU map with a per-entry time to live.
+
+    Lives in process memory, so each worker has its own copy; ``ttl`` bounds
+    how long another worker's stale entry can be served after an
+    invalidation that only reached this process.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Drop every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            for key in [key for key, (value, _) in self._data.items() if predicate(key, value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Striped locks for single_flight: threads rebuilding the same key queue up
+_FLIGHT_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def single_flight(cache, key, build, timeout=None, lock_timeout=30, wait=5):
+    """
+    ``cache.get(key)``, rebuilding a miss with ``build()`` exactly once.
+
+    Threads of this process wait on a local lock. Other processes sharing
+    the cache take an ``add()`` lock, and the losers poll for the winner's
+    value for up to ``wait`` seconds before building it themselves. A
+    crashed builder only holds the lock for ``lock_timeout`` seconds.
+    ``build()`` must not return None.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _FLIGHT_LOCKS[zlib.crc32(key.encode()) % len(_FLIGHT_LOCKS)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return value
@@ -0,0 +1,56 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def conditional(etag=None, last_modified=None):
+    """
+    Conditional GET for APIView handlers.
+
+    ``etag`` and ``last_modified`` are called with the handler's
+    ``(request, *args, **kwargs)`` after DRF has authenticated the request.
+    If the client's If-None-Match / If-Modified-Since still matches, the
+    response is 304 and the handler never runs, so nothing is queried or
+    serialized. Responses are marked ``private, no-cache`` so clients keep
+    them but revalidate on every poll; a 304 carries the same
+    Cache-Control and Vary as the 200 it stands for (RFC 9110, 15.4.5).
+    Only 2xx responses are tagged, so an error is never revalidated.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if not (200 <= response.status_code < 300 or response.status_code == 304):
+                del response['ETag']
+                del response['Last-Modified']
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie', 'Authorization'])
+            return response
+        return wrapper
+    return method_decorator(decorator)
+
+
+def request_etag(request, *parts):
+    # Bodies carry absolute URLs and depend on the query string, so both go in the hash
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.get_host(), request.get_full_path(), *parts):
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return 'W/"%s"' % digest.hexdigest()
+
+
+def digest_etag(get_queryset, *fields):
+    """
+    ETag from a digest of ``fields`` over every row, for small tables
+    without a modification timestamp. One narrow query instead of loading
+    and serializing the models.
+    """
+    def etag(request, *args, **kwargs):
+        rows = get_queryset(request, *args, **kwargs).order_by('pk').values_list(*fields)
+        return request_etag(request, *rows)
+    return etag
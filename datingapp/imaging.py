@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger('datingapp.imaging')
+
+# Sent with ``pk`` after image_variants changes through update(), which
+# sends no post_save; caches of serialized rows listen for it
+variants_updated = Signal()
+
+# Pillow format name, file extension
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def _config():
+    return getattr(settings, 'IMAGE_VARIANTS', {})
+
+
+def variant_sizes(instance, field_name):
+    """``{variant: (width, height, mode)}`` configured for ``app_label.Model.field``."""
+    label = f'{instance._meta.label}.{field_name}'
+    return {name: tuple(spec) for name, spec in _config().get('SIZES', {}).get(label, {}).items()}
+
+
+def render_variant(image, width, height, mode):
+    """
+    Resize a decoded image. ``crop`` fills the box exactly (avatars, grid
+    tiles); ``fit`` keeps the whole picture inside it. Never upscales.
+    """
+    if mode == 'crop':
+        size = (min(width, image.width), min(height, image.height))
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def encode(image, file_format):
+    pil_format, _ = FORMATS[file_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    # No exif= / icc_profile= arguments: the output carries pixels only
+    image.save(buffer, pil_format, quality=_config().get('QUALITY', {}).get(file_format, 80), optimize=True)
+    return buffer.getvalue()
+
+
+def generate_variants(instance, field_name):
+    """
+    Write every configured variant of ``instance.<field_name>`` to storage.
+
+    Returns the value stored in the model's ``image_variants`` field:
+    ``{'source': <original name>, 'sizes': {variant: {format: name}}}``.
+    EXIF orientation is applied before resizing and all metadata dropped.
+    """
+    field_file = getattr(instance, field_name)
+    storage = field_file.storage
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+
+    with field_file.open('rb'), Image.open(field_file) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    sizes = {}
+    for name, (width, height, mode) in variant_sizes(instance, field_name).items():
+        resized = render_variant(original, width, height, mode)
+        sizes[name] = {}
+        for file_format in _config().get('FORMATS', list(FORMATS)):
+            extension = FORMATS[file_format][1]
+            target = os.path.join(directory, 'variants', f'{stem}_{name}.{extension}')
+            sizes[name][file_format] = storage.save(target, ContentFile(encode(resized, file_format)))
+    return {'source': field_file.name, 'sizes': sizes}
+
+
+def variant_names(variants):
+    """Every storage name recorded in an ``image_variants`` value."""
+    return [name for formats in (variants or {}).get('sizes', {}).values() for name in formats.values()]
+
+
+def delete_variants(storage, variants):
+    for name in variant_names(variants):
+        storage.delete(name)
+
+
+def _touch(model):
+    # update() skips auto_now; bump it so ETags built on updated_at see the new variants
+    field = next((f for f in model._meta.concrete_fields if getattr(f, 'auto_now', False)), None)
+    return {field.name: timezone.now()} if field else {}
+
+
+def process(model_label, pk, field_name, source):
+    """Build variants for one row; skipped if the image changed again meanwhile."""
+    model = apps.get_model(model_label)
+    try:
+        instance = model.objects.get(pk=pk)
+        field_file = getattr(instance, field_name)
+        if field_file.name != source:
+            return
+        previous = instance.image_variants
+        try:
+            variants = generate_variants(instance, field_name)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+            logger.warning("image variants failed", extra={
+                'event': 'image_variants_failed', 'model': model_label, 'pk': pk, 'error': str(exc),
+            })
+            return
+        updated = model.objects.filter(pk=pk, **{field_name: source}).update(
+            image_variants=variants, **_touch(model)
+        )
+        # Drop the old set, or the new one if the image was replaced while we worked
+        delete_variants(field_file.storage, previous if updated else variants)
+        if updated:
+            variants_updated.send(sender=model, pk=pk)
+    except model.DoesNotExist:
+        pass
+
+
+def process_in_background(*args):
+    try:
+        process(*args)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config().get('WORKERS', 2), thread_name_prefix='image-variants'
+                )
+    return _executor
+
+
+def schedule_variants(instance, field_name):
+    """
+    Queue variant generation for a saved instance, or clear stale variants.
+
+    Runs after the transaction commits, on a background thread unless
+    ``IMAGE_VARIANTS['ASYNC']`` is off. Saves that leave the image alone
+    schedule nothing.
+    """
+    field_file = getattr(instance, field_name)
+    variants = instance.image_variants or {}
+    if not field_file:
+        if variants:
+            instance.image_variants = {}
+            type(instance).objects.filter(pk=instance.pk).update(image_variants={}, **_touch(type(instance)))
+            variants_updated.send(sender=type(instance), pk=instance.pk)
+            transaction.on_commit(lambda: delete_variants(field_file.storage, variants))
+        return
+    if variants.get('source') == field_file.name or not variant_sizes(instance, field_name):
+        return
+
+    args = (instance._meta.label, instance.pk, field_name, field_file.name)
+    if _config().get('ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(process_in_background, *args))
+    else:
+        transaction.on_commit(lambda: process(*args))
+
+
+def variant_urls(instance, field_name, request=None):
+    """``{variant: {format: url}}`` for serializers; empty until variants exist."""
+    storage = getattr(instance, field_name).storage
+    urls = {}
+    for name, formats in (instance.image_variants or {}).get('sizes', {}).items():
+        urls[name] = {}
+        for file_format, stored in formats.items():
+            url = storage.url(stored)
+            urls[name][file_format] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,85 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message plus any ``extra`` fields."""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Logging handler that never blocks the calling thread on I/O.
+
+    Records go onto a bounded in-memory queue; a background
+    ``QueueListener`` thread formats them and writes them to ``stream``
+    (stdout by default). If the queue is full the record is dropped and
+    counted rather than stalling the request.
+
+    The listener starts on the first record a process emits, not when
+    settings load: threads do not survive ``fork``, so a worker forked
+    from a preloaded server (gunicorn ``--preload``) would inherit a queue
+    nobody drains. Each process that logs gets its own queue and thread.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.listener = None
+        self.pid = None
+        atexit.register(self.stop)
+
+    def start(self):
+        # Records queued by the parent before the fork belong to the parent
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def stop(self):
+        # A listener inherited through fork has no thread here to join
+        if self.pid == os.getpid():
+            self.listener.stop()
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, not in the request
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        # Called under the handler lock, which logging reinitialises in a forked child
+        if self.pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
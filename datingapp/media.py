@@ -0,0 +1,159 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import storages
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import ContentAddressedStorage
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+READ_BLOCK = 64 * 1024
+
+
+def _config():
+    return getattr(settings, 'MEDIA_SERVING', {})
+
+
+def file_etag(name, stat):
+    # Content-addressed names are the digest itself; other files use mtime and size
+    storage = storages['default']
+    if isinstance(storage, ContentAddressedStorage) and storage.is_blob(name):
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single ``bytes=`` range, ``None`` to
+    send the whole file (no header, or several ranges) and ``()`` when
+    the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:  # suffix: the last N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else ()
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            block = handle.read(min(READ_BLOCK, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT for production deployments.
+
+    Sends ETag and Last-Modified and answers conditional requests with 304
+    or 412. Content-addressed blobs (``cas/``) are cached as immutable,
+    everything else for ``MEDIA_SERVING['MAX_AGE']``. With
+    ``MEDIA_SERVING['SENDFILE']`` set, only headers are built here and
+    the body is left to the front proxy through X-Accel-Redirect (nginx)
+    or X-Sendfile (Apache, lighttpd). Otherwise single byte ranges are
+    answered with 206.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    name = path.replace('\\', '/')
+    if not os.path.isfile(full_path) or name.startswith('cas/tmp/'):  # blobs still being written
+        raise Http404
+
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    cache_control = IMMUTABLE if name.startswith('cas/') else f"public, max-age={_config().get('MAX_AGE', 3600)}"
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _body(request, full_path, name, stat.st_size, etag, last_modified)
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(last_modified))
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _body(request, full_path, name, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    sendfile = _config().get('SENDFILE')
+    if sendfile:
+        # The proxy reads the file and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = _config().get('ACCEL_PREFIX', '/protected-media/') + name
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is not None and not _if_range_matches(request, etag, last_modified):
+        byte_range = None
+    if byte_range == ():
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        start, length, status = 0, size, 200
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length, status = end - start + 1, 206
+        body = _read(full_path, start, length) if request.method != 'HEAD' else ()
+        response = StreamingHttpResponse(body, status=status, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    # If-Range: honour the Range only if the client's copy is still current
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def media_urlpatterns():
+    """URL patterns serving MEDIA_URL through :func:`serve_media`, unless disabled."""
+    if not _config().get('ENABLED', True):
+        return []
+    prefix = settings.MEDIA_URL.lstrip('/')
+    return [re_path(r'^%s(?P<path>.*)$' % re.escape(prefix), serve_media, name='media')]
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -64,11 +65,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
- 
-    "django.middleware.common.CommonMiddleware",
-    'accounts.middleware.RefreshCookieToBodyMiddleware',
+    # RefreshCookieToBodyMiddleware is applied to the refresh route only (accounts/urls.py)
 ]
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 ROOT_URLCONF = "datingapp.urls"
 
@@ -100,6 +98,38 @@ DATABASES = {
     }
 }
 
+# Closed-term attendance moved by `manage.py archive_attendance`. To keep it in a
+# separate database, add e.g.
+#   DATABASES["archive"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "archive.sqlite3"}
+# set ATTENDANCE_ARCHIVE_DATABASE = "archive" and run `manage.py migrate --database archive`.
+DATABASE_ROUTERS = ["accounts.routers.AttendanceArchiveRouter"]
+ATTENDANCE_ARCHIVE_DATABASE = "default"
+# Default cutoff (YYYY-MM-DD, exclusive) when archive_attendance runs without --before
+ATTENDANCE_ARCHIVE_BEFORE = None
+
+# Logging
+# Structured JSON lines written by a background thread (datingapp.log), so request
+# threads never block on stdout. Set LOG_LEVEL=DEBUG to include per-request events.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "datingapp.log.JSONFormatter"},
+    },
+    "handlers": {
+        "async_json": {
+            "()": "datingapp.log.QueueListenerHandler",
+            "formatter": "json",
+        },
+    },
+    "loggers": {
+        "accounts": {"handlers": ["async_json"], "level": LOG_LEVEL, "propagate": False},
+        "products": {"handlers": ["async_json"], "level": LOG_LEVEL, "propagate": False},
+        "datingapp": {"handlers": ["async_json"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -119,6 +149,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Argon2id first: new passwords use it and older PBKDF2 hashes are rehashed on
+# the next successful login. Cost follows OWASP's minimum (19 MiB, t=2, p=1).
+PASSWORD_HASHERS = [
+    "accounts.hashers.TunedArgon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+ARGON2_PARAMETERS = {
+    "TIME_COST": 2,
+    "MEMORY_COST": 19456,  # KiB
+    "PARALLELISM": 1,
+}
+
+# Password checks for login run on a bounded pool (accounts.password_pool).
+# WORKERS defaults to the CPU count; requests beyond WORKERS + MAX_PENDING wait
+# up to WAIT seconds and then get 429.
+LOGIN_POOL = {
+    "WORKERS": None,
+    "MAX_PENDING": 64,
+    "WAIT": 2,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -142,6 +197,76 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL="accounts.Users"
+
+# Caches
+# Local memory is per process; point these at Redis/Memcached when running several workers.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    # Responses replayed for retried requests carrying an Idempotency-Key header
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "idempotency",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+IDEMPOTENCY_CACHE = "idempotency"
+# Seconds a key answers 409 while its first request runs; bounds how long a crashed worker blocks it
+IDEMPOTENCY_IN_PROGRESS_TIMEOUT = 60
+
+# Serialized product catalog pages (products.cache), keyed by host, query and the
+# products.CatalogVersion row that product writes bump (the one the ETag is built from),
+# so a write is seen by every worker at once even with a per-process cache. Old entries
+# age out after TIMEOUT.
+CATALOG_CACHE = {
+    "ENABLED": True,
+    "CACHE": "default",
+    "TIMEOUT": 300,
+    "LOCK_TIMEOUT": 30,  # single-flight rebuild lock
+    "WAIT": 5,  # how long other processes wait for that rebuild
+}
+
+# Opt-in per-process cache of authenticated users in front of the lookup done by
+# JWTAuthenticationFromCookie. Saves invalidate the local process immediately;
+# other workers see the change after at most TTL seconds.
+AUTH_USER_CACHE = {
+    "ENABLED": False,
+    "MAX_SIZE": 1024,
+    "TTL": 60,
+}
+
+# Per-process cache of verified access tokens (keyed by a SHA-256 of the raw
+# token, kept until the token's exp) so repeat requests skip JWT decoding.
+# User lookup and the is_active check still run on every request.
+AUTH_TOKEN_CACHE = {
+    "ENABLED": True,
+    "MAX_SIZE": 4096,
+}
+
+# In-memory Bloom filter of blacklisted refresh-token JTIs checked before the
+# token_blacklist tables; only "maybe blacklisted" answers reach the database.
+# Blacklists made by other workers are picked up within SYNC_INTERVAL seconds; ids
+# that commit out of order are looked for again for SYNC_OVERLAP seconds.
+TOKEN_BLACKLIST_FILTER = {
+    "ENABLED": True,
+    "CAPACITY": 100_000,
+    "ERROR_RATE": 0.001,
+    "SYNC_INTERVAL": 5,
+    "SYNC_OVERLAP": 60,
+}
+
+# Defaults for `manage.py compact_tokens`, which deletes expired
+# OutstandingToken/BlacklistedToken rows. Run it from cron, or as one
+# long-lived process with --interval; never from the web workers.
+TOKEN_COMPACTION = {
+    "BATCH_SIZE": 500,
+    "TIME_BUDGET": 5,
+    "PAUSE": 0.05,
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'accounts.authentication.JWTAuthenticationFromCookie',
@@ -213,6 +338,62 @@ CSRF_TRUSTED_ORIGINS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# MEDIA_URL is served by datingapp.media.serve_media (ETag/Last-Modified, Range,
+# immutable caching for cas/ blobs). With SENDFILE set to "x-accel-redirect" (nginx,
+# needs an `internal` location at ACCEL_PREFIX aliased to MEDIA_ROOT) or "x-sendfile"
+# (Apache/lighttpd) the proxy sends the bytes. Set ENABLED to False when the proxy
+# serves MEDIA_ROOT directly.
+MEDIA_SERVING = {
+    "ENABLED": True,
+    "SENDFILE": None,
+    "ACCEL_PREFIX": "/protected-media/",
+    "MAX_AGE": 3600,
+}
+
+# Uploads are stored once per distinct content under MEDIA_ROOT/cas/ and named by
+# their SHA-256 (datingapp.storage). Blobs are shared, so deleting a file leaves the
+# blob; `manage.py gc_media` removes the ones nothing references any more.
+STORAGES = {
+    "default": {"BACKEND": "datingapp.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Resumable chunked profile image uploads (accounts.uploads). Chunks are appended
+# straight to DIR on local disk, so with several hosts every chunk of an upload must
+# reach the same host (or DIR must be shared). Idle uploads expire after EXPIRE_AFTER s.
+# A chunk's claim on its byte range that nobody touched for STALE_AFTER s (worker killed
+# mid-chunk) is pulled back to the bytes on disk when the client asks again.
+CHUNKED_UPLOADS = {
+    "DIR": os.path.join(tempfile.gettempdir(), "datingapp-uploads"),
+    "MAX_SIZE": 10 * 1024 * 1024,
+    "EXTENSIONS": ["jpg", "jpeg", "png", "gif", "webp"],
+    "EXPIRE_AFTER": 24 * 3600,
+    "STALE_AFTER": 15,
+}
+
+# Resized, metadata-free copies of uploaded images (datingapp.imaging), built on a
+# background thread after the upload commits and exposed as `image_variants` by the
+# serializers. SIZES maps "app_label.Model.field" to {variant: [width, height, mode]}
+# where mode "crop" fills the box and "fit" keeps the whole image inside it.
+# `manage.py generate_image_variants` backfills existing uploads.
+IMAGE_VARIANTS = {
+    "ASYNC": True,
+    "WORKERS": 2,
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": {"webp": 80, "jpeg": 82},
+    "SIZES": {
+        "accounts.UserProfile.profile_image": {
+            "thumb": [120, 120, "crop"],
+            "medium": [480, 480, "crop"],
+        },
+        "products.Product.image": {
+            "thumb": [320, 320, "crop"],
+            "medium": [800, 800, "fit"],
+            "large": [1600, 1600, "fit"],
+        },
+    },
+}
+
 CORS_ALLOWED_ORIGINS = True
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -0,0 +1,38 @@
+"""
+Lean settings profile for API-only workers.
+
+Select it with DJANGO_SETTINGS_MODULE=datingapp.settings_api. Admin,
+jazzmin, sessions, messages, static files, templates and the middleware
+that only serve them are left out. Authentication is JWT (header or
+cookie), so nothing here needs sessions or CSRF. Run the admin and
+`collectstatic` from the default profile.
+`manage.py measure_settings_profile` reports what the profile saves.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in {
+        "jazzmin",
+        "django.contrib.admin",
+        "django.contrib.sessions",
+        "django.contrib.messages",
+        "django.contrib.staticfiles",
+    }
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "datingapp.urls_api"
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+}
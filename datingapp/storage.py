@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import models
+
+GCReport = namedtuple('GCReport', 'blobs references shared deleted freed_bytes')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that keeps each distinct content once, named by its digest.
+
+    ``save()`` ignores the suggested name except for its extension: the
+    content is hashed (SHA-256) while it is copied to a temp file and then
+    moved to ``cas/ab/cd/<digest>.<ext>``. Re-uploading the same bytes
+    returns the existing name without writing anything. A name always
+    describes the same bytes, so its URL can be cached forever.
+
+    Blobs may be shared between rows, so ``delete()`` leaves them in place.
+    Unreferenced blobs are removed by :func:`collect_garbage`
+    (``manage.py gc_media``). Files saved before this backend, outside
+    ``cas/``, behave as in FileSystemStorage.
+    """
+    prefix = 'cas'
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(), collisions are the point
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(os.path.join(self.prefix, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    handle.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            final = os.path.join(self.prefix, hexdigest[:2], hexdigest[2:4], hexdigest + extension)
+            final_path = self.path(final)
+            if os.path.exists(final_path):
+                # Known content: refresh its mtime so gc's grace period covers the new reference
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return final.replace('\\', '/')
+
+    def delete(self, name):
+        if self.is_blob(name):
+            return
+        super().delete(name)
+
+    def is_blob(self, name):
+        return bool(name) and name.replace('\\', '/').startswith(f'{self.prefix}/')
+
+
+def referenced_blobs():
+    """
+    Count the references to every blob across the database.
+
+    Every FileField on a content-addressed storage counts. So does every
+    variant name recorded in an ``image_variants`` field
+    (datingapp.imaging).
+    """
+    from .imaging import variant_names
+
+    references = Counter()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage):
+                names = model._default_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+                references.update(names.values_list(field.name, flat=True).iterator())
+            elif field.name == 'image_variants':
+                for variants in model._default_manager.values_list(field.name, flat=True).iterator():
+                    references.update(variant_names(variants))
+    return references
+
+
+def collect_garbage(storage=None, grace=3600, dry_run=False):
+    """
+    Delete blobs nothing references any more, plus abandoned temp files.
+
+    Files younger than ``grace`` seconds are kept. A blob is written before
+    the row pointing at it commits, so a young blob may just be a reference
+    in flight.
+    """
+    storage = storage or storages['default']
+    if not isinstance(storage, ContentAddressedStorage):
+        return GCReport(0, 0, 0, 0, 0)
+    references = referenced_blobs()
+    cutoff = time.time() - grace
+    blobs = deleted = freed = 0
+
+    root = storage.path(storage.prefix)
+    for directory, _, filenames in os.walk(root):
+        in_tmp = os.path.relpath(directory, root).split(os.sep)[0] == 'tmp'
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if not in_tmp:
+                blobs += 1
+                if references[name]:
+                    continue
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+            deleted += 1
+            freed += stat.st_size
+
+    shared = sum(1 for name, count in references.items() if count > 1 and storage.is_blob(name))
+    return GCReport(blobs, sum(references.values()), shared, deleted, freed)
@@ -16,8 +16,7 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.conf import settings
-from django.conf.urls.static import static
+from datingapp.media import media_urlpatterns
 from django.urls import path, include
 
 urlpatterns = [
@@ -26,6 +25,5 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
 ]
 
-# Serve media files (e.g., profile images) in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve media files (e.g., profile images) with caching headers, see MEDIA_SERVING
+urlpatterns += media_urlpatterns()
@@ -0,0 +1,12 @@
+"""URL configuration for the API-only settings profile (datingapp.settings_api): no admin."""
+
+from datingapp.media import media_urlpatterns
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/accounts/', include('accounts.urls')),
+    path('api/products/', include('products.urls')),
+]
+
+# Serve media files (e.g., profile images) with caching headers, see MEDIA_SERVING
+urlpatterns += media_urlpatterns()
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    # Table rebuilds in SQLite migrations drop the index triggers; put them back
+    from .search import FTS_TABLE, ensure_search_index
+
+    connection = connections[using]
+    if FTS_TABLE in connection.introspection.table_names():
+        ensure_search_index(connection)
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(restore_search_index, sender=self)
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from datingapp.cache import single_flight
+from datingapp.conditional import request_etag
+
+from .models import CatalogVersion
+
+
+def _config():
+    return getattr(settings, 'CATALOG_CACHE', {})
+
+
+def _cache():
+    return caches[_config().get('CACHE', 'default')]
+
+
+def catalog_version(request):
+    """
+    The :class:`~products.models.CatalogVersion` counter, read once per
+    request with a primary-key lookup.
+
+    Both the ETag and the cache key are built from it, so every worker
+    sees the same version right after a write whatever cache backend is
+    configured. Product saves, deletes and variant updates bump it
+    (products.signals); writes through ``update()`` must call
+    ``CatalogVersion.objects.bump()`` themselves.
+    """
+    if '_catalog_version' not in request.__dict__:
+        request._catalog_version = CatalogVersion.objects.current()
+    return request._catalog_version
+
+
+def catalog_etag(request):
+    return request_etag(request, catalog_version(request))
+
+
+def cached_catalog(request, build, version, *parts):
+    """
+    Serialized catalog data for ``parts`` (category, ...), built at most once per
+    ``version`` (see :func:`catalog_version`), host and parts, with concurrent
+    misses collapsed into one build. Entries of older versions just age out.
+    """
+    if not _config().get('ENABLED', True):
+        return build()
+    # Parts include free text (?q=), so they are hashed into a short key any backend accepts
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.build_absolute_uri('/'), version, *parts):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return single_flight(
+        _cache(), f'products:catalog:{digest.hexdigest()}', build,
+        timeout=_config().get('TIMEOUT', 300),
+        lock_timeout=_config().get('LOCK_TIMEOUT', 30),
+        wait=_config().get('WAIT', 5),
+    )
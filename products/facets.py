@@ -0,0 +1,55 @@
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .models import Product
+
+# Upper bounds of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (500, 1000, 2500, 5000, 10000)
+
+
+def price_bucket():
+    """Index into PRICE_BUCKETS of a row's price, computed in the database."""
+    return Case(
+        *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(PRICE_BUCKETS)],
+        default=Value(len(PRICE_BUCKETS)),
+        output_field=IntegerField(),
+    )
+
+
+def facet_counts(queryset):
+    """
+    Product counts per category, company and price bucket for ``queryset``.
+
+    One grouped query returns a row per (category, company, bucket)
+    combination present, which is folded into the three facets here.
+    The counts describe ``queryset`` as filtered, so a facet that is
+    itself being filtered on only shows the selected value.
+    """
+    rows = (
+        queryset.order_by()
+        .values('category', 'company', bucket=price_bucket())
+        .annotate(products=Count('pk'))
+    )
+    categories, companies = {}, {}
+    buckets = [0] * (len(PRICE_BUCKETS) + 1)
+    for row in rows:
+        categories[row['category']] = categories.get(row['category'], 0) + row['products']
+        if row['company']:
+            companies[row['company']] = companies.get(row['company'], 0) + row['products']
+        buckets[row['bucket']] += row['products']
+
+    labels = dict(Product.Product_Catagory)
+    bounds = (0, *PRICE_BUCKETS, None)
+    return {
+        'category': [
+            {'value': value, 'label': labels.get(value, value), 'count': categories[value]}
+            for value in labels if value in categories
+        ],
+        'company': [
+            {'value': value, 'count': count}
+            for value, count in sorted(companies.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'price': [
+            {'min': bounds[index], 'max': bounds[index + 1], 'count': count}
+            for index, count in enumerate(buckets)
+        ],
+    }
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from products.search import drop_search_index, ensure_search_index
+
+
+def create_index(apps, schema_editor):
+    ensure_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_product_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
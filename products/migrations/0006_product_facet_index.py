@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["category", "company", "price", "stock"],
+                name="product_active_facet_idx",
+            ),
+        ),
+    ]
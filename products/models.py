@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 
 # Create your models here.
 from django.db import models
@@ -31,14 +32,59 @@ class Product(models.Model):
     stock = models.IntegerField()
     category = models.CharField(choices=Product_Catagory,max_length=50)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Storage names of the resized copies of image (datingapp.imaging)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     
 
+    class Meta:
+        indexes = [
+            # Catalog pages: active products (per category) newest first, see utils.get_active_products.
+            # Partial on is_active: Django emits a bare `WHERE is_active`, which a partial index
+            # matches but a leading is_active column would not (SQLite), and inactive rows stay out.
+            models.Index(
+                fields=['category', 'created_at', 'id'], condition=Q(is_active=True),
+                name='product_active_category_idx',
+            ),
+            models.Index(fields=['created_at', 'id'], condition=Q(is_active=True), name='product_active_created_idx'),
+            # Covers every column the facet counts and filters read (see facets.facet_counts), so the
+            # one grouped query scans this narrow index instead of rows carrying descriptions.
+            models.Index(
+                fields=['category', 'company', 'price', 'stock'], condition=Q(is_active=True),
+                name='product_active_facet_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
     
-    
\ No newline at end of file
+    
+
+class CatalogVersionManager(models.Manager):
+    def current(self):
+        return self.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    def bump(self):
+        """Move the catalog to a new version, inside the writer's own transaction."""
+        if not self.filter(pk=1).update(version=F('version') + 1):
+            self.get_or_create(pk=1, defaults={'version': 1})
+
+
+class CatalogVersion(models.Model):
+    """
+    One row counting catalog writes (see products.signals).
+
+    Catalog ETags and cached pages are keyed on it, so a request reads a
+    primary key instead of aggregating the product table, and every
+    worker sees a write as soon as it commits.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    objects = CatalogVersionManager()
+
+    def __str__(self):
+        return f"catalog v{self.version}"
@@ -0,0 +1,222 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'products_product_fts'
+MAX_TERMS = 8
+# Shorter trailing words are matched exactly: a one-letter prefix matches most of the catalog
+MIN_PREFIX = 2
+# bm25 column weights, in the order of the FTS5 columns
+WEIGHTS = {'name': 10.0, 'description': 1.0, 'company': 5.0}
+
+# SQLite: external-content FTS5 table over products_product, kept in sync by triggers.
+# prefix='2 3' indexes short prefixes so search-as-you-type stays cheap.
+SQLITE_INDEX = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, company,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, company)
+        VALUES (new.id, new.name, new.description, new.company);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, company)
+        VALUES ('delete', old.id, old.name, old.description, old.company);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, description, company
+    ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, company)
+        VALUES ('delete', old.id, old.name, old.description, old.company);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, company)
+        VALUES (new.id, new.name, new.description, new.company);
+    END
+    """,
+]
+SQLITE_TRIGGERS = [f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update']
+
+# Postgres: a generated tsvector column (so every write keeps it current) under a GIN index.
+# 'simple' keeps names and brands as typed instead of stemming them as English.
+POSTGRES_INDEX = [
+    """
+    ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(company, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS products_product_search_idx ON products_product USING GIN (search_vector)",
+]
+
+
+def _has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _has_fts_table(connection):
+    # Absent when SQLite was built without FTS5; searches then fall back to icontains.
+    # Asked once per database connection: a reconnect replaces connection.connection.
+    cached = connection.__dict__.get('_fts_table')
+    if cached is not None and cached[0] is connection.connection:
+        return cached[1]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        exists = cursor.fetchone() is not None
+    connection._fts_table = (connection.connection, exists)
+    return exists
+
+
+def ensure_search_index(connection):
+    """
+    Create the full-text index if it is missing; safe to run repeatedly.
+
+    On SQLite the triggers belong to products_product, and every table
+    rebuild done by a later migration drops them, so this also runs after
+    each migrate (see apps.py). Recreated triggers are followed by a
+    rebuild of the index, since writes in between went unrecorded.
+    """
+    connection.__dict__.pop('_fts_table', None)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in POSTGRES_INDEX:
+                cursor.execute(statement)
+    elif connection.vendor == 'sqlite' and _has_fts5(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                SQLITE_TRIGGERS,
+            )
+            missing = cursor.fetchone()[0] < len(SQLITE_TRIGGERS)
+            for statement in SQLITE_INDEX:
+                cursor.execute(statement)
+            if missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(connection):
+    connection.__dict__.pop('_fts_table', None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS products_product_search_idx")
+            cursor.execute("ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector")
+        elif connection.vendor == 'sqlite':
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def search_terms(q):
+    """The words of a ``?q=`` value; punctuation is dropped so no query syntax gets through."""
+    return re.findall(r'\w+', q or '')[:MAX_TERMS]
+
+
+def _prefix_last(terms):
+    # The last word may still be being typed
+    return len(terms[-1]) >= MIN_PREFIX
+
+
+def fts5_query(terms):
+    quoted = ['"%s"' % term for term in terms]
+    if _prefix_last(terms):
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def tsquery(terms):
+    words = list(terms)
+    if _prefix_last(terms):
+        words[-1] += ':*'
+    return ' & '.join(words)
+
+
+def _tsquery_sql(table, template):
+    return template.format(vector=f'{table}.search_vector', query="to_tsquery('simple', %s)")
+
+
+def _contains_all(queryset, terms):
+    for term in terms:
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(description__icontains=term) | Q(company__icontains=term)
+        )
+    return queryset
+
+
+def matching(queryset, q):
+    """
+    ``queryset`` narrowed to the products matching every word of ``q``,
+    in no particular order; for counting and faceting a search. An empty
+    ``q`` matches nothing.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return queryset.none()
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (fts5_query(terms),)
+        ))
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return queryset.alias(
+            matches=RawSQL(_tsquery_sql(table, '{vector} @@ {query}'), (tsquery(terms),), BooleanField()),
+        ).filter(matches=True)
+    return _contains_all(queryset, terms)
+
+
+def ranked_ids(queryset, q, limit, offset=0):
+    """
+    Primary keys of the products in ``queryset`` matching every word of
+    ``q``, best match first (name weighs most, then company, then
+    description; ties newest first).
+
+    The queryset's own filters run inside the search query, so the
+    catalog conditions (active, category, ...) cut the candidates before
+    they are ranked. Without a full-text index (another database, or
+    SQLite built without FTS5) this degrades to unranked ``icontains``.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        inner, params = queryset.values('id').query.sql_with_params()
+        weights = ', '.join(str(weight) for weight in WEIGHTS.values())
+        sql = (
+            f"SELECT p.id FROM {FTS_TABLE} JOIN ({inner}) p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights}), p.id DESC LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (*params, fts5_query(terms), limit, offset))
+            return [row[0] for row in cursor.fetchall()]
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return list(
+            matching(queryset, q)
+            .annotate(rank=RawSQL(_tsquery_sql(table, 'ts_rank({vector}, {query})'), (tsquery(terms),), FloatField()))
+            .order_by('-rank', '-pk')
+            .values_list('pk', flat=True)[offset:offset + limit]
+        )
+    queryset = _contains_all(queryset, terms).order_by('-created_at', '-pk')
+    return list(queryset.values_list('pk', flat=True)[offset:offset + limit])
+
+
+def search(queryset, q, limit, offset=0):
+    """The products for :func:`ranked_ids`, in rank order."""
+    ids = ranked_ids(queryset, q, limit, offset)
+    rows = queryset.model._default_manager.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
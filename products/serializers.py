@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from .models import Product
+from datingapp.imaging import variant_urls
+from .search import search_terms
 
 class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -13,3 +16,37 @@ class ProductSerializer(serializers.ModelSerializer):
         if obj.image and hasattr(obj.image, 'url'):
             return request.build_absolute_uri(obj.image.url)
         return None
+
+    def get_image_variants(self, obj):
+        # {"thumb": {"webp": url, "jpeg": url}, ...}; empty until the background resize finishes
+        return variant_urls(obj, 'image', self.context.get('request'))
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    """Validates the query-string filters accepted by the product listing."""
+    category = serializers.ChoiceField(choices=Product.Product_Catagory, required=False)
+    company = serializers.CharField(max_length=100, required=False)
+    price_min = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    in_stock = serializers.BooleanField(default=False, help_text="Only products with stock left")
+    q = serializers.CharField(required=False, allow_blank=True, help_text="Full-text search, ranked by relevance")
+    facets = serializers.BooleanField(default=False, help_text="Add category, company and price counts")
+
+    def validate(self, attrs):
+        if 'price_min' in attrs and 'price_max' in attrs and attrs['price_min'] > attrs['price_max']:
+            raise serializers.ValidationError({'price_max': "Must not be below price_min."})
+        attrs['q'] = ' '.join(search_terms(attrs.get('q')))
+        return attrs
+
+    def filter_queryset(self, queryset):
+        """Everything but ``category`` (see utils.get_active_products) and ``q``, which ranking applies."""
+        filters = self.validated_data
+        if 'company' in filters:
+            queryset = queryset.filter(company=filters['company'])
+        if 'price_min' in filters:
+            queryset = queryset.filter(price__gte=filters['price_min'])
+        if 'price_max' in filters:
+            queryset = queryset.filter(price__lte=filters['price_max'])
+        if filters['in_stock']:
+            queryset = queryset.filter(stock__gt=0)
+        return queryset
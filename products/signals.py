@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from datingapp.imaging import schedule_variants, variants_updated
+
+from .models import CatalogVersion, Product
+
+
+# Resize new product images in the background once the upload is committed
+@receiver(post_save, sender=Product)
+def build_product_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image')
+
+
+# Every catalog write, admin edits included, moves the version cached pages and ETags are keyed on
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(variants_updated, sender=Product)
+def bump_catalog_version(sender, **kwargs):
+    CatalogVersion.objects.bump()
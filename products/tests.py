@@ -1,3 +1,203 @@
+import re
+import unittest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from datingapp.imaging import variants_updated
+
+from .facets import facet_counts
+from .models import CatalogVersion, Product
+from .search import ranked_ids
+from .utils import get_active_products
+from .views import ProductPagination
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "query plans are checked against SQLite")
+class CatalogQueryPlanTests(TestCase):
+    """Fail if a catalog page stops being served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f'Item {number}', price=1, stock=1, category=('decor', 'others')[number % 2])
+            for number in range(300)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def page_plan(self, category=None, cursor=None):
+        """Query plan of the page query ProductPagination really sends."""
+        paginator = ProductPagination()
+        request = Request(APIRequestFactory().get('/', {'cursor': cursor} if cursor else {}))
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            paginator.paginate_queryset(get_active_products(category), request)
+        # Explained with the same bound parameters: literals can get a different plan
+        sql, params = queries[-1]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def deep_cursor(self):
+        row = get_active_products().order_by('-created_at', '-id')[150]
+        return ProductPagination().encode_cursor([row.created_at, row.id])
+
+    def assertIndexOnly(self, plan, index):
+        # An ordered walk of an index under LIMIT is fine; a table scan or a sort is not
+        self.assertEqual([line for line in re.findall(r'\bSCAN .*', plan) if 'USING' not in line], [], plan)
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+        self.assertIn(index, plan, plan)
+
+    def assertSeeks(self, plan, index):
+        # Deep pages start at the cursor instead of walking every newer row
+        self.assertIndexOnly(plan, index)
+        self.assertRegex(plan, r'SEARCH .*%s \(.*created_at<' % index)
+
+    def test_first_page(self):
+        self.assertIndexOnly(self.page_plan(), 'product_active_created_idx')
+
+    def test_deep_page(self):
+        self.assertSeeks(self.page_plan(cursor=self.deep_cursor()), 'product_active_created_idx')
+
+    def test_category_deep_page(self):
+        self.assertSeeks(self.page_plan('decor', self.deep_cursor()), 'product_active_category_idx')
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def create(name, description='', company='', **fields):
+            return Product.objects.create(
+                name=name, description=description, company=company, price=1, stock=1, category='decor', **fields
+            )
+
+        cls.bowl = create('Brass singing bowl', 'Hand hammered', 'Patan Metal')
+        cls.mask = create('Wooden mask', 'Hangs well next to a singing bowl')
+        cls.hidden = create('Singing bowl seconds', is_active=False)
+        for number in range(20):
+            create(f'Filler {number}', 'Nothing to see')
+
+    def search(self, q):
+        return ranked_ids(get_active_products(), q, 10)
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('singing bowl'), [self.bowl.pk, self.mask.pk])
+
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(self.search('patan met'), [self.bowl.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('bowl OR mask'), [])
+        self.assertEqual(self.search('"bowl*'), [self.bowl.pk, self.mask.pk])
+
+    def test_index_follows_writes(self):
+        self.mask.name = 'Carved mask'
+        self.mask.description = ''
+        self.mask.save()
+        self.assertEqual(self.search('bowl'), [self.bowl.pk])
+        self.assertEqual(self.search('carved'), [self.mask.pk])
+        self.mask.delete()
+        self.assertEqual(self.search('carved'), [])
+
+    def test_index_lookup_once_per_connection(self):
+        self.search('bowl')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.search('mask'), [self.mask.pk])
+        self.assertEqual(len(captured), 1)
+        self.assertNotIn('sqlite_master', captured[0]['sql'])
+
+
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name, price, company, category, stock in [
+            ('Singing bowl', 800, 'Patan Metal', 'religious', 3),
+            ('Copper bowl', 2400, 'Patan Metal', 'decor', 0),
+            ('Wooden mask', 300, 'Bhaktapur Crafts', 'decor', 1),
+            ('Sarangi', 12000, '', 'musical', 1),
+        ]:
+            Product.objects.create(name=name, price=price, company=company, category=category, stock=stock)
+        Product.objects.create(name='Old lamp', price=50, category='decor', stock=1, is_active=False)
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = facet_counts(get_active_products())
+        self.assertEqual(
+            [(facet['value'], facet['count']) for facet in facets['category']],
+            [('decor', 2), ('religious', 1), ('musical', 1)],
+        )
+        self.assertEqual(facets['company'], [
+            {'value': 'Patan Metal', 'count': 2}, {'value': 'Bhaktapur Crafts', 'count': 1},
+        ])
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 1, 1, 0, 0, 1])
+        self.assertEqual(facets['price'][-1], {'min': 10000, 'max': None, 'count': 1})
+
+    def test_counts_follow_filters(self):
+        facets = facet_counts(get_active_products().filter(stock__gt=0))
+        self.assertEqual(facets['company'], [
+            {'value': 'Bhaktapur Crafts', 'count': 1}, {'value': 'Patan Metal', 'count': 1},
+        ])
+        self.assertEqual(sum(bucket['count'] for bucket in facets['price']), 3)
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='Brass bowl', price=1, stock=1, category='decor')
+
+    def setUp(self):
+        # Each test rolls the version back, so pages cached by an earlier test would match it
+        caches[settings.CATALOG_CACHE['CACHE']].clear()
+        self.client = APIClient()
+
+    def test_save_is_served_at_once(self):
+        first = self.client.get('/api/products/')
+        self.product.name = 'Copper bowl'
+        self.product.save()
+
+        second = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data['results'][0]['name'], 'Copper bowl')
+
+    def test_delete_and_variant_updates_move_the_version(self):
+        versions = [CatalogVersion.objects.current()]
+        variants_updated.send(sender=Product, pk=self.product.pk)
+        versions.append(CatalogVersion.objects.current())
+        self.product.delete()
+        versions.append(CatalogVersion.objects.current())
+        self.assertEqual(len(set(versions)), 3)
+        self.assertEqual(self.client.get('/api/products/').data['results'], [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "query plans are checked against SQLite")
+    def test_cache_hit_reads_one_row(self):
+        first = self.client.get('/api/products/')
+        for headers in ({}, {'HTTP_IF_NONE_MATCH': first['ETag']}):
+            queries = []
+
+            def capture(execute, sql, params, many, context):
+                queries.append((sql, params))
+                return execute(sql, params, many, context)
 
-# Create your tests here.
+            with connection.execute_wrapper(capture):
+                response = self.client.get('/api/products/', **headers)
+            self.assertIn(response.status_code, (200, 304))
+            # No aggregate over products: one primary-key lookup of the version row
+            self.assertEqual(len(queries), 1, queries)
+            sql, params = queries[0]
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            self.assertRegex(plan, r'SEARCH products_catalogversion USING INTEGER PRIMARY KEY')
+            self.assertNotIn('SCAN', plan)
@@ -2,6 +2,12 @@
 from .models import Product
 
 def get_active_products(category=None):
+    """
+    The one query path for catalog listings. Matches the is_active
+    condition of the partial indexes product_active_category_idx and
+    product_active_created_idx, so ordering by (-created_at, -id) and
+    keyset seeks run on the index.
+    """
     queryset = Product.objects.filter(is_active=True)
     if category:
         queryset = queryset.filter(category=category)
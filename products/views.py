@@ -1,19 +1,99 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+from datingapp.conditional import conditional
+from datingapp.pagination import KeysetPagination
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductFilterSerializer, ProductSerializer
+from .cache import cached_catalog, catalog_etag, catalog_version
+from .facets import facet_counts
+from .search import matching, search
+from .utils import get_active_products
+
+class ProductPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 200
+
+
+class ProductSearchPagination(BasePagination):
+    """
+    Numbered pages over ``?q=`` results. Relevance has no column to seek
+    on, so pages are an offset into the ranking; one extra row is fetched
+    to know whether a next page exists.
+    """
+    page_size = 50
+    max_page_size = 200
+    max_page = 100
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    invalid_page_message = 'Invalid page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page = self.get_page_number(request)
+        page_size = self.get_page_size(request)
+        rows = search(queryset, request.query_params.get('q'), page_size + 1, (self.page - 1) * page_size)
+        self.has_next = len(rows) > page_size and self.page < self.max_page
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_number(self, request):
+        try:
+            page = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message)
+        if not 1 <= page <= self.max_page:
+            raise NotFound(self.invalid_page_message)
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page + 1)
 
 # in views.py
 class ProductList(APIView):
+    pagination_class = ProductPagination
+    search_pagination_class = ProductSearchPagination
+
+    @conditional(etag=catalog_etag)
     def get(self, request):
-        category = request.GET.get('category')
-        products = Product.objects.filter(is_active=True)
-        if category:
-            products = products.filter(category=category)
-        
-        # 👇 Pass request context here
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        
-        return Response(serializer.data)
+        filters = ProductFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        # ?q= ranks by relevance instead of listing newest first
+        paginator = self.search_pagination_class() if params['q'] else self.pagination_class()
+
+        def build():
+            queryset = filters.filter_queryset(get_active_products(params.get('category')))
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            # 👇 Pass request context here
+            serializer = ProductSerializer(page, many=True, context={'request': request})
+            data = paginator.get_paginated_response(list(serializer.data)).data
+            if params['facets']:
+                # Counted over every match of the filters and search, not just this page
+                data['facets'] = facet_counts(matching(queryset, params['q']) if params['q'] else queryset)
+            return data
+
+        position = paginator.page_query_param if params['q'] else paginator.cursor_query_param
+        return Response(cached_catalog(
+            request, build, catalog_version(request), *sorted(params.items()),
+            request.GET.get(position, ''), paginator.get_page_size(request),
+        ))
 